@@ -0,0 +1,234 @@
+import math
+import threading
+from collections import deque, Counter
+from datetime import datetime
+
+
+class RollingStats:
+    """إحصائيات متدحرجة تُحدّث تدريجياً بتكلفة O(1) لكل صفقة"""
+
+    def __init__(self, window=30):
+        # window=None يعني تراكمياً بدون حد (بدون تخزين القيم)
+        self.window = window
+        self.profits = deque()
+        self._n = 0
+        self.symbols = Counter()
+        self._symbol_queue = deque()
+
+        # مجاميع النافذة
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.sum_down_sq = 0.0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.wins = 0
+
+        # منحنى الأرباح التراكمي (منذ البداية)
+        self.count = 0
+        self.equity = 0.0
+        self.peak = 0.0
+        self.lifetime_max_drawdown = 0.0
+
+    def push(self, profit, symbol=None):
+        """إضافة صفقة وإزالة الأقدم خارج النافذة"""
+        self._add(profit)
+        if symbol is not None:
+            self.symbols[symbol] += 1
+        if self.window is not None:
+            self.profits.append(profit)
+            if symbol is not None:
+                self._symbol_queue.append(symbol)
+
+        if self.window is not None and len(self.profits) > self.window:
+            self._remove(self.profits.popleft())
+            if len(self._symbol_queue) > self.window:
+                old = self._symbol_queue.popleft()
+                self.symbols[old] -= 1
+                if self.symbols[old] <= 0:
+                    del self.symbols[old]
+
+        # السحب الأقصى منذ البداية
+        self.count += 1
+        self.equity += profit
+        self.peak = max(self.peak, self.equity)
+        self.lifetime_max_drawdown = max(self.lifetime_max_drawdown, self.peak - self.equity)
+
+    def _add(self, profit):
+        self._n += 1
+        self.sum += profit
+        self.sum_sq += profit * profit
+        if profit > 0:
+            self.wins += 1
+            self.gross_profit += profit
+        else:
+            self.gross_loss -= profit
+            self.sum_down_sq += profit * profit
+
+    def _remove(self, profit):
+        self._n -= 1
+        self.sum -= profit
+        self.sum_sq -= profit * profit
+        if profit > 0:
+            self.wins -= 1
+            self.gross_profit -= profit
+        else:
+            self.gross_loss += profit
+            self.sum_down_sq -= profit * profit
+
+    @property
+    def n(self):
+        return self._n
+
+    @property
+    def win_rate(self):
+        return self.wins / self.n if self.n else 0.0
+
+    @property
+    def expectancy(self):
+        return self.sum / self.n if self.n else 0.0
+
+    @property
+    def std(self):
+        if self.n < 2:
+            return 0.0
+        variance = (self.sum_sq - self.sum * self.sum / self.n) / (self.n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def sharpe(self):
+        """نسبة شارب لكل صفقة (المتوسط / الانحراف) - بدون تحويل سنوي، فلا تكبر مع عدد الصفقات"""
+        std = self.std
+        return self.expectancy / std if std > 0 else 0.0
+
+    @property
+    def sortino(self):
+        """نسبة سورتينو لكل صفقة (المتوسط / انحراف الخسائر)"""
+        if not self.n:
+            return 0.0
+        downside = math.sqrt(max(self.sum_down_sq, 0.0) / self.n)
+        return self.expectancy / downside if downside > 0 else 0.0
+
+    @property
+    def max_drawdown(self):
+        """أقصى تراجع داخل النافذة (منحنى أرباح صفقات النافذة فقط) - O(window) عند الطلب"""
+        if self.window is None:
+            return self.lifetime_max_drawdown
+        equity = peak = drawdown = 0.0
+        for profit in self.profits:
+            equity += profit
+            peak = max(peak, equity)
+            drawdown = max(drawdown, peak - equity)
+        return drawdown
+
+    @property
+    def profit_factor(self):
+        if self.gross_loss <= 0:
+            return 999.0 if self.gross_profit > 0 else 0.0
+        return self.gross_profit / self.gross_loss
+
+    def to_dict(self):
+        return {
+            "trades": self.count,
+            "window_trades": self.n,
+            "win_rate": round(self.win_rate * 100, 2),
+            "expectancy": round(self.expectancy, 4),
+            "total_profit": round(self.equity, 4),
+            "max_drawdown": round(self.max_drawdown, 4),
+            "lifetime_max_drawdown": round(self.lifetime_max_drawdown, 4),
+            "sharpe": round(self.sharpe, 3),
+            "sortino": round(self.sortino, 3),
+            "profit_factor": round(self.profit_factor, 3)
+        }
+
+
+class PerformanceAnalytics:
+    """تحليلات أداء متدفقة لكل استراتيجية وعملة وفترة زمنية"""
+
+    PERIODS = {
+        "daily": lambda ts: ts.strftime("%Y-%m-%d"),
+        "weekly": lambda ts: "%d-W%02d" % ts.isocalendar()[:2],
+        "monthly": lambda ts: ts.strftime("%Y-%m")
+    }
+
+    def __init__(self, window=30):
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """مسح جميع الإحصائيات"""
+        with self.lock:
+            self.overall = RollingStats(self.window)
+            self.by_strategy = {}
+            self.by_symbol = {}
+            self.periods = {}
+            self.period_keys = {}
+
+    def record(self, trade, timestamp=None):
+        """تسجيل صفقة جديدة في جميع المجموعات"""
+        profit = float(trade.get('profit', 0))
+        symbol = trade.get('symbol')
+        strategy = trade.get('strategy', 'unknown')
+        timestamp = timestamp or self._trade_time(trade)
+
+        with self.lock:
+            self.overall.push(profit, symbol)
+            self.by_strategy.setdefault(strategy, RollingStats(self.window)).push(profit, symbol)
+            self.by_symbol.setdefault(symbol, RollingStats(self.window)).push(profit)
+
+            for name, key_func in self.PERIODS.items():
+                key = key_func(timestamp)
+                current = self.period_keys.get(name)
+                if current is None or key > current:
+                    # بداية فترة جديدة - إعادة التصفير
+                    self.period_keys[name] = key
+                    self.periods[name] = RollingStats(window=None)
+                elif key < current:
+                    # صفقة من فترة منتهية لا تعيد الفترة الحالية إلى الوراء
+                    continue
+                self.periods[name].push(profit)
+
+    def rebuild(self, trades):
+        """إعادة بناء الإحصائيات من سجل الصفقات عند بدء التشغيل"""
+        self.reset()
+        for trade in trades:
+            self.record(trade)
+
+    def period_profit(self, name, now=None):
+        """ربح الفترة الحالية (يوم/أسبوع/شهر)"""
+        now = now or datetime.now()
+        with self.lock:
+            if self.period_keys.get(name) != self.PERIODS[name](now):
+                return 0.0
+            return self.periods[name].equity
+
+    def snapshot(self):
+        """لقطة كاملة للعرض في /stats"""
+        now = datetime.now()
+        with self.lock:
+            periods = {}
+            for name, key_func in self.PERIODS.items():
+                if self.period_keys.get(name) == key_func(now):
+                    periods[name] = self.periods[name].to_dict()
+                else:
+                    periods[name] = RollingStats(window=None).to_dict()
+
+            return {
+                "window": self.window,
+                "overall": self.overall.to_dict(),
+                "unique_symbols": len(self.overall.symbols),
+                "by_strategy": {k: v.to_dict() for k, v in self.by_strategy.items()},
+                "by_symbol": {k: v.to_dict() for k, v in self.by_symbol.items()},
+                "periods": periods
+            }
+
+    @staticmethod
+    def _trade_time(trade):
+        """وقت تحقق الربح: الخروج لصفقات المحاكي (تُغلق بغير ترتيب الدخول) وإلا الدخول"""
+        value = trade.get('exit_time') or trade.get('entry_time', '')
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        try:
+            return datetime.fromisoformat(str(value).replace('Z', ''))
+        except ValueError:
+            return datetime.now()
@@ -0,0 +1,81 @@
+"""مقارنة تحليل الشموع: المسار القديم (DataFrame object + to_numeric) مقابل kline_decoder
+
+python bench_klines.py [عدد الشموع] [عدد التكرارات]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+import pandas as pd
+from kline_decoder import decode_klines
+
+COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
+]
+
+
+def make_payload(count):
+    """رد /klines واقعي كبايتات"""
+    now = 1700000000000
+    price = 30000.0
+    rows = []
+    for i in range(count):
+        price *= 1 + random.uniform(-0.002, 0.002)
+        rows.append([
+            now + i * 60000, f"{price:.8f}", f"{price * 1.001:.8f}", f"{price * 0.999:.8f}",
+            f"{price:.8f}", f"{random.uniform(1, 100):.8f}", now + i * 60000 + 59999,
+            f"{random.uniform(1e4, 1e6):.8f}", random.randint(10, 1000),
+            f"{random.uniform(1, 50):.8f}", f"{random.uniform(1e4, 5e5):.8f}", "0"
+        ])
+    return json.dumps(rows).encode()
+
+
+def legacy(payload):
+    """المسار القديم في get_advanced_signal"""
+    klines = json.loads(payload)
+    df = pd.DataFrame(klines, columns=COLUMNS)
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.dropna()
+
+
+def decoder(payload):
+    return decode_klines(payload).to_frame()
+
+
+def measure(func, payload, repeat):
+    # الوقت
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(payload)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    # الذاكرة: ذروة التخصيص لاستدعاء واحد
+    tracemalloc.start()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    payload = make_payload(count)
+
+    results = {}
+    for name, func in (("legacy", legacy), ("decoder", decoder)):
+        func(payload)
+        results[name] = measure(func, payload, repeat)
+        elapsed, peak = results[name]
+        print(f"{name:8s} {elapsed * 1e6:10.1f} us/call   peak {peak / 1024:8.1f} KiB")
+
+    speedup = results["legacy"][0] / results["decoder"][0]
+    memory = results["legacy"][1] / max(results["decoder"][1], 1)
+    print(f"candles={count}  speedup x{speedup:.1f}  peak memory x{memory:.1f} lower")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+from binance.client import Client
+from hybrid_bot_engine import AIONHybridBot
+from market_data import MarketDataHub
+from credentials import CredentialValidator
+from scan_cluster import ClusterFeed, SignalQueue
+from settings import SettingsStore
+from structured_log import get_logger, log_event
+
+logger = get_logger("bot_pool")
+
+
+class BotPool:
+    """مجموعة محركات معزولة (حساب/استراتيجية لكل محرك) تتشارك طبقة بيانات سوق واحدة"""
+
+    DEFAULT = "default"
+
+    def __init__(self, base_dir="accounts", scan_queue=None, market_client=None):
+        self.base_dir = base_dir
+        self.bots = {}
+        self.lock = threading.Lock()
+        self.market_client = market_client
+        self.market_lock = threading.Lock()
+        # جلب البيانات وحساب المؤشرات يتم مرة واحدة لكل الحسابات
+        self.market_data = MarketDataHub(self._market_client)
+        # تحقق المفاتيح ونتائجه المخزنة مشتركة بين الحسابات
+        self.validator = CredentialValidator()
+        # ملف إعدادات واحد لكل الحسابات - كل محرك يطبق التغييرات عند إعادة التحميل
+        self.settings = SettingsStore()
+        # المسح الموزع: طابور واحد لكل العملية، إشاراته تُوزع على كل الحسابات العاملة
+        self.cluster_feed = ClusterFeed(SignalQueue(scan_queue)) if scan_queue else None
+
+    def _market_client(self):
+        """عميل عام (بدون مفاتيح) على الشبكة الرئيسية لبيانات السوق
+        عملاء الحسابات لا يُستخدمون: حساب DEMO متصل بـ testnet وأسعاره تختلف عن الحقيقية"""
+        with self.market_lock:
+            if self.market_client is None:
+                try:
+                    self.market_client = Client()
+                except Exception as e:
+                    # إعادة المحاولة في الطلب التالي
+                    log_event(logger, logging.WARNING, f"⚠️ تعذر إنشاء عميل بيانات السوق: {e}", stage="market_data",
+                              error_class=type(e).__name__)
+            return self.market_client
+
+    def create(self, name):
+        """إنشاء محرك جديد بمساحة حالة خاصة به"""
+        with self.lock:
+            if name in self.bots:
+                return self.bots[name]
+            # الحساب الافتراضي يحتفظ بملفاته في المجلد الحالي كما في السابق
+            state_dir = "." if name == self.DEFAULT else os.path.join(self.base_dir, name)
+            bot = AIONHybridBot(name=name, state_dir=state_dir, market_data=self.market_data,
+                                validator=self.validator, cluster_feed=self.cluster_feed,
+                                settings=self.settings)
+            self.bots[name] = bot
+            return bot
+
+    def get(self, name):
+        return self.bots.get(name)
+
+    def remove(self, name):
+        """إيقاف وإزالة محرك (ملفات الحالة تبقى على القرص)"""
+        with self.lock:
+            bot = self.bots.pop(name, None)
+        if bot:
+            # shutdown يحفظ الحالة حتى إذا لم يكن المحرك يتداول
+            bot.shutdown()
+        return bot is not None
+
+    def shutdown(self):
+        """إيقاف جميع المحركات وحفظ حالاتها"""
+        for bot in list(self.bots.values()):
+            bot.shutdown()
+
+    def names(self):
+        return list(self.bots)
+
+    def summary(self):
+        return [
+            {
+                "name": name,
+                "running": bot.running,
+                "mode": bot.mode,
+                "balance": round(bot.balance, 2),
+                "has_keys": bot.api_key is not None
+            }
+            for name, bot in list(self.bots.items())
+        ]
@@ -0,0 +1,209 @@
+import base64
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from binance.client import Client
+from structured_log import get_logger, log_event
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # التشفير اختياري
+    Fernet = None
+    InvalidToken = None
+
+logger = get_logger("credentials")
+
+PRICE_SYMBOLS = ("BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT")
+MODES = ("DEMO", "LIVE")
+
+
+class CredentialStore:
+    """ملف مفاتيح آمن: كتابة ذرية، صلاحيات 0600، وتشفير اختياري بمفتاح من البيئة (BOT_KEYS_SECRET)"""
+
+    def __init__(self, path, secret_env="BOT_KEYS_SECRET"):
+        self.path = path
+        self.secret_env = secret_env
+
+    def _cipher(self):
+        secret = os.getenv(self.secret_env)
+        if not secret:
+            return None
+        if Fernet is None:
+            log_event(logger, logging.WARNING, f"⚠️ {self.secret_env} معيّن لكن مكتبة cryptography غير مثبتة - الحفظ بدون تشفير",
+                      stage="keys")
+            return None
+        # أي عبارة سرية تتحول إلى مفتاح Fernet صالح
+        return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()))
+
+    def save(self, api_key, api_secret):
+        payload = {
+            'api_key': api_key,
+            'api_secret': api_secret,
+            'last_updated': datetime.now().isoformat()
+        }
+        cipher = self._cipher()
+        if cipher:
+            payload = {'encrypted': True, 'data': cipher.encrypt(json.dumps(payload).encode()).decode()}
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # mkstemp ينشئ الملف بصلاحيات 0600 - المفاتيح لا تُكتب أبداً في ملف مقروء للجميع
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".keys-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(payload, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return bool(cipher)
+
+    def load(self):
+        """يعيد (api_key, api_secret) أو (None, None)"""
+        if not os.path.exists(self.path):
+            return None, None
+        os.chmod(self.path, 0o600)
+        with open(self.path, 'r') as f:
+            keys = json.load(f)
+
+        cipher = self._cipher()
+        if keys.get('encrypted'):
+            if cipher is None:
+                raise RuntimeError(f"ملف المفاتيح مشفر - يلزم {self.secret_env}")
+            try:
+                keys = json.loads(cipher.decrypt(keys['data'].encode()))
+            except InvalidToken:
+                raise RuntimeError(f"تعذر فك تشفير المفاتيح - تحقق من {self.secret_env}")
+        elif cipher:
+            # ترحيل ملف قديم غير مشفر
+            self.save(keys.get('api_key'), keys.get('api_secret'))
+
+        return keys.get('api_key'), keys.get('api_secret')
+
+    def clear(self):
+        """حذف ملف المفاتيح - يعيد True إذا كان موجوداً"""
+        try:
+            os.remove(self.path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def explain_error(error_msg):
+    """شرح مفهوم لأخطاء Binance الشائعة"""
+    if "Invalid API-key" in error_msg:
+        return "مفتاح API غير صحيح - تأكد من نسخه من testnet.binance.vision"
+    if "Signature" in error_msg:
+        return "مفتاح Secret غير صحيح - تأكد من نسخه بشكل كامل"
+    if "restrictions" in error_msg.lower():
+        return "قيود جغرافية - قد تحتاج VPN"
+    if "connection" in error_msg.lower():
+        return "مشكلة في الاتصال - تحقق من الإنترنت"
+    return "خطأ غير معروف"
+
+
+class CredentialValidator:
+    """تحقق غير متزامن من المفاتيح مع تخزين النتيجة والعميل المتحقق منه لمدة TTL"""
+
+    def __init__(self, ttl=300, failure_ttl=15, max_workers=2):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="keys")
+        self.lock = threading.Lock()
+        self.results = {}
+        self.pending = {}
+
+    @staticmethod
+    def _key(api_key, api_secret, mode):
+        # لا تُحفظ المفاتيح نفسها كمفاتيح في الذاكرة المؤقتة
+        return hashlib.sha256(f"{mode}:{api_key}:{api_secret}".encode()).hexdigest()
+
+    def cached(self, api_key, api_secret, mode):
+        """آخر نتيجة صالحة أو None"""
+        with self.lock:
+            entry = self.results.get(self._key(api_key, api_secret, mode))
+            if entry and entry[0] > time.time():
+                return entry[1]
+            return None
+
+    def validate(self, api_key, api_secret, mode):
+        """Future بنتيجة التحقق - طلبات متزامنة لنفس المفاتيح تتشارك نفس الاختبار"""
+        key = self._key(api_key, api_secret, mode)
+        with self.lock:
+            entry = self.results.get(key)
+            if entry and entry[0] > time.time():
+                future = concurrent.futures.Future()
+                future.set_result(entry[1])
+                return future
+            if key in self.pending:
+                return self.pending[key]
+            future = self.executor.submit(self._run, key, api_key, api_secret, mode)
+            self.pending[key] = future
+            return future
+
+    def invalidate(self, api_key, api_secret, mode=None):
+        """إسقاط النتيجة المخزنة (وعميلها المتصل) للمفاتيح - لكل الأوضاع إذا لم يُحدد الوضع"""
+        with self.lock:
+            for key in [self._key(api_key, api_secret, m) for m in ((mode,) if mode else MODES)]:
+                self.results.pop(key, None)
+                # اختبار جارٍ لنفس المفاتيح لا يُخزن نتيجته بعد الإسقاط
+                self.pending.pop(key, None)
+
+    def _run(self, key, api_key, api_secret, mode):
+        try:
+            result = self._check(api_key, api_secret, mode)
+        except Exception as e:
+            result = {
+                "success": False,
+                "message": "❌ فشل في الاتصال",
+                "details": explain_error(str(e)),
+                "error": str(e)
+            }
+            log_event(logger, logging.WARNING, "❌ فشل التحقق من المفاتيح", stage="keys", mode=mode,
+                      error_class=type(e).__name__)
+        ttl = self.ttl if result["success"] else self.failure_ttl
+        now = time.time()
+        with self.lock:
+            # تنظيف النتائج المنتهية حتى لا تتراكم مفاتيح الاختبار
+            for stale in [k for k, (expires, _) in self.results.items() if expires <= now]:
+                del self.results[stale]
+            if self.pending.pop(key, None) is not None:
+                self.results[key] = (now + ttl, result)
+        return result
+
+    def _check(self, api_key, api_secret, mode):
+        """جولتان فقط: كل الأسعار في طلب واحد + الحساب"""
+        client = Client(api_key, api_secret, testnet=(mode == "DEMO"))
+
+        tickers = {t['symbol']: t['price'] for t in client.get_symbol_ticker()}
+        prices = {symbol: float(tickers[symbol]) if symbol in tickers else "غير متاح" for symbol in PRICE_SYMBOLS}
+
+        account_info = client.get_account()
+        available = len([p for p in prices.values() if isinstance(p, float)])
+        log_event(logger, logging.INFO, "✅ تم التحقق من المفاتيح", stage="keys", mode=mode, prices=available)
+        return {
+            "success": True,
+            "message": f"✅ المفاتيح صحيحة - اتصال ناجح بـ {available}/{len(PRICE_SYMBOLS)} عملات",
+            "details": {
+                "can_trade": account_info.get('canTrade', False),
+                "account_type": "Testnet" if mode == "DEMO" else "Real",
+                "balances_count": len(account_info.get('balances', [])),
+                "prices": prices,
+                "account_update_time": account_info.get('updateTime')
+            },
+            "client": client
+        }
+
+    @staticmethod
+    def public(result):
+        """النتيجة بدون كائن العميل (للـ JSON)"""
+        return {k: v for k, v in result.items() if k != "client"}
@@ -0,0 +1,54 @@
+from indicators import SERIES_GROUPS
+
+
+def _indicator(name):
+    return lambda df, ind: ind[name].iloc[-1]
+
+
+def _column(name, offset=-1):
+    return lambda df, ind: df[name].iloc[offset]
+
+
+def _price_change(df, ind):
+    prev_close = df['close'].iloc[-2]
+    return (df['close'].iloc[-1] - prev_close) / prev_close * 100
+
+
+# 🧮 سجل الميزات: الاسم -> دالة تستخرج قيمة واحدة من الشموع والمؤشرات
+FEATURES = {
+    "rows": lambda df, ind: len(df),
+    "open": _column('open'),
+    "high": _column('high'),
+    "low": _column('low'),
+    "close": _column('close'),
+    "volume": _column('volume'),
+    "prev_close": _column('close', -2),
+    "prev_high": _column('high', -2),
+    "prev_volume": _column('volume', -2),
+    "price_change": _price_change,
+}
+
+# كل سلاسل المؤشرات متاحة كميزات (تُحسب فقط عند طلبها)
+for _name in SERIES_GROUPS:
+    FEATURES[_name] = _indicator(_name)
+
+# التقلب كنسبة من السعر - مناسب لمقارنة العملات وتحجيم الصفقات
+FEATURES["atr_pct"] = lambda df, ind: ind['atr'].iloc[-1] / df['close'].iloc[-1] * 100
+
+# ميزات يضيفها المحرك بنفسه (مثل السعر الحي)
+RUNTIME_FEATURES = {"price"}
+
+
+def register_feature(name, func):
+    """إضافة ميزة جديدة إلى السجل"""
+    FEATURES[name] = func
+
+
+def build_features(df, indicators, names, features=None):
+    """حساب الميزات المطلوبة فقط (وإكمال متجه موجود إن وُجد)"""
+    features = {} if features is None else features
+    for name in names:
+        if name in features or name in RUNTIME_FEATURES:
+            continue
+        features[name] = float(FEATURES[name](df, indicators))
+    return features
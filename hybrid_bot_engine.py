@@ -3,15 +3,51 @@ import time
 import json
 import os
 from datetime import datetime, timedelta
-import pandas as pd
 import numpy as np
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
-from indicators import compute_indicators
+from analytics import PerformanceAnalytics
+from trade_ledger import TradeLedger, BalanceSeries, to_epoch
+from timeseries_store import BalanceTimeseriesStore
+from market_data import MarketDataHub
+from signal_bus import SignalBus
+from strategies import default_strategy_set
+from risk_engine import RiskEngine
+from projection import MonteCarloProjector
+from credentials import CredentialStore, CredentialValidator
+from paper_trading import PaperTrader
+from settings import SettingsStore
 import concurrent.futures
+import logging
+from structured_log import setup_logging, get_logger, log_event, Timer
+
+logger = get_logger("engine")
 
 class AIONHybridBot:
-    def __init__(self):
+    # العمال ومدة العمل القصوى بين نبضتين قبل اعتبار العامل عالقاً (بالثواني، دون النوم)
+    WORKER_STALL_SECONDS = {
+        "multi_symbol_monitoring": 300,
+        "opportunity_analyzer": 180,
+        "execution_worker": 60,
+        "paper_trading": 60
+    }
+    # إعدادات النوم بين الدورات - مهلة الصمت تتسع لأطولها حتى لا يُعاد تشغيل عامل نائم
+    WORKER_SLEEP_SETTINGS = {
+        "multi_symbol_monitoring": ("scan_sleep", "error_sleep"),
+        "opportunity_analyzer": ("quick_scan_sleep", "error_sleep"),
+        "execution_worker": (),
+        "paper_trading": ("paper_poll_seconds",)
+    }
+    
+    def __init__(self, name="default", state_dir=".", market_data=None, validator=None, cluster_feed=None,
+                 settings=None):
+        setup_logging()
+        
+        # 🏷️ مساحة الحالة الخاصة بهذا الحساب
+        self.name = name
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        
         # 🎯 إعدادات الهدف
         self.initial_balance = 50.0
         self.balance = 50.0
@@ -20,7 +56,15 @@ class AIONHybridBot:
         self.start_date = datetime.now()
         
         # 📈 تتبع التاريخ للأداء
-        self.balance_history = [{"timestamp": datetime.now().isoformat(), "balance": 50.0}]
+        # 🔧 الإعدادات القابلة للضبط (settings.json / BOT_* في البيئة) مع إعادة تحميل أثناء التشغيل
+        self.settings_store = settings or SettingsStore()
+        self.settings = self.settings_store.current
+        
+        self.balance_history = BalanceSeries(max_points=self.settings.balance_history_points)
+        self.balance_history.append(50.0)
+        
+        # 🗂️ مخزن الرصيد متعدد الدقة للرسوم طويلة المدى
+        self.balance_store = BalanceTimeseriesStore(path=self.state_path("hybrid_balance_ts.npz"))
         
         # 🧠 مؤشر الذكاء التكيفي
         self.adaptive_intelligence = {
@@ -38,23 +82,34 @@ class AIONHybridBot:
         # 📊 المؤشرات الفنية
         self.client = None
         self.running = False
-        self.trades = []
+        
+        # 🔁 دورة حياة المحرك: إلغاء تعاوني، عمال قابلون للانتظار، ومراقب
+        self.lifecycle_lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.workers = {}
+        self.heartbeats = {}
+        self.watchdog_restarts = {}
+        self.state_lock = threading.Lock()
+        self.trades = TradeLedger()
+        self.trades_file = self.state_path("hybrid_trades.npz")
+        self.state_file = self.state_path("hybrid_state.json")
         self.live_trades = []
         self.api_key = None
         self.api_secret = None
         self.mode = "DEMO"
         
-        # 🔐 حفظ المفاتيح تلقائياً
-        self.keys_file = "saved_keys.json"
+        # 🔐 حفظ المفاتيح تلقائياً (كتابة ذرية + تشفير اختياري) والتحقق المخزن مؤقتاً
+        self.keys_file = self.state_path("saved_keys.json")
+        self.credentials = CredentialStore(self.keys_file)
+        self.validator = validator or CredentialValidator()
+        
+        # 📡 بيانات السوق - مشتركة بين الحسابات أو خاصة بهذا المحرك
+        self.market_data = market_data or MarketDataHub(lambda: self.client)
+        # 🌐 المسح الموزع: عند توفره تأتي إشارات المسح من عقد خارجية (انظر scan_worker.py)
+        self.cluster_feed = cluster_feed
         
-        # 🌐 قائمة العملات الموسعة (25 عملة)
-        self.symbols = [
-            "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT",
-            "SOLUSDT", "DOTUSDT", "DOGEUSDT", "AVAXUSDT", "LINKUSDT",
-            "LTCUSDT", "BCHUSDT", "XLMUSDT", "ATOMUSDT", "ETCUSDT",
-            "XMRUSDT", "EOSUSDT", "TRXUSDT", "XTZUSDT", "ALGOUSDT",
-            "BATUSDT", "COMPUSDT", "MKRUSDT", "ZECUSDT", "DASHUSDT"
-        ]
+        # 🌐 قائمة العملات الموسعة (25 عملة افتراضياً)
+        self.symbols = list(self.settings.symbols)
         
         self.performance = {
             "daily": 0, "weekly": 0, "monthly": 0,
@@ -64,132 +119,278 @@ class AIONHybridBot:
             "symbols_traded": set()
         }
         
-        # 🧠 الذاكرة الهجينة
-        self.memory = []
-        self.strategy_weights = {
-            "mean_reversion": 0.4, 
-            "momentum": 0.3, 
-            "trend_following": 0.2,
-            "breakout": 0.1
-        }
+        # 🧠 الذاكرة الهجينة (آخر 200 صفقة من السجل افتراضياً)
+        self.memory_size = self.settings.memory_size
+        # 🧩 الاستراتيجيات القابلة للتوسعة (انظر strategies.py)
+        self.strategies = default_strategy_set()
+        self.strategy_weights = self.strategies.initial_weights()
         
         # 🔄 آخر وقت تداول لكل عملة
         self.last_trade_time = {}
         
+        # 🛡️ محرك المخاطر - تعرض حي لكل عملة/استراتيجية/مجموعة مترابطة
+        self.risk = RiskEngine(
+            self.symbols,
+            holding_seconds=30 * 60,
+            strategy_budgets={name: max(0.60 * weight, 0.20) for name, weight in self.strategy_weights.items()}
+        )
+        
+        # 📄 محاكي التنفيذ للوضع التجريبي (انزلاق من عمق الدفتر + خروج بالوقف/الهدف/الوقت)
+        self.paper = PaperTrader(self.market_data, hold_seconds=self.risk.holding_seconds)
+        
+        # 📨 ناقل الإشارات - دمج إشارات الماسحات وترتيبها قبل التنفيذ
+        self.max_open_trades = self.settings.max_open_trades
+        self.signal_bus = SignalBus(
+            weight_provider=lambda strategy: self.strategy_weights.get(strategy, 0.0),
+            dedup_window=60
+        )
+        
+        # 🎲 إسقاط مونت كارلو نحو الهدف (يُحسب في الخلفية)
+        self.projector = MonteCarloProjector(paths=20000)
+        
+        # 📊 تحليلات الأداء المتدفقة (نافذة آخر 30 صفقة)
+        self.analytics = PerformanceAnalytics(window=30)
+        
         self.load_state()
         self.load_saved_keys()
     
     def load_saved_keys(self):
         """تحميل المفاتيح المحفوظة تلقائياً"""
         try:
-            if os.path.exists(self.keys_file):
-                with open(self.keys_file, 'r') as f:
-                    keys = json.load(f)
-                    self.api_key = keys.get('api_key')
-                    self.api_secret = keys.get('api_secret')
-                    if self.api_key and self.api_secret:
-                        self.client = Client(self.api_key, self.api_secret, testnet=(self.mode=="DEMO"))
-                        print("✅ تم تحميل المفاتيح المحفوظة تلقائياً")
-                        return True
+            self.api_key, self.api_secret = self.credentials.load()
+            if self.api_key and self.api_secret:
+                self.client = Client(self.api_key, self.api_secret, testnet=(self.mode=="DEMO"))
+                log_event(logger, logging.INFO, "✅ تم تحميل المفاتيح المحفوظة تلقائياً", account=self.name, stage="keys")
+                return True
             return False
         except Exception as e:
-            print(f"❌ خطأ في تحميل المفاتيح: {e}")
+            log_event(logger, logging.ERROR, f"❌ خطأ في تحميل المفاتيح: {e}", account=self.name, stage="keys", error_class=type(e).__name__)
             return False
     
     def save_keys(self, api_key, api_secret):
         """حفظ المفاتيح تلقائياً"""
         try:
-            keys_data = {
-                'api_key': api_key,
-                'api_secret': api_secret,
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.keys_file, 'w') as f:
-                json.dump(keys_data, f, indent=2)
-            print("✅ تم حفظ المفاتيح تلقائياً")
+            encrypted = self.credentials.save(api_key, api_secret)
+            log_event(logger, logging.INFO, "✅ تم حفظ المفاتيح تلقائياً", account=self.name, stage="keys", encrypted=encrypted)
             return True
         except Exception as e:
-            print(f"❌ خطأ في حفظ المفاتيح: {e}")
+            log_event(logger, logging.ERROR, f"❌ خطأ في حفظ المفاتيح: {e}", account=self.name, stage="keys", error_class=type(e).__name__)
             return False
     
-    def set_keys(self, api_key, api_secret, mode="DEMO"):
+    def clear_keys(self):
+        """مسح المفاتيح المحفوظة ونتيجة تحققها المخزنة"""
+        self.credentials.clear()
+        if self.api_key and self.api_secret:
+            self.validator.invalidate(self.api_key, self.api_secret)
+        self.api_key = None
+        self.api_secret = None
+        self.client = None
+        log_event(logger, logging.INFO, "🗑️ تم مسح المفاتيح", account=self.name, stage="keys")
+    
+    def set_keys(self, api_key, api_secret, mode="DEMO", timeout=30):
         """تعيين وحفظ المفاتيح تلقائياً"""
         try:
-            print(f"🔧 جاري تعيين المفاتيح للوضع: {mode}")
+            log_event(logger, logging.INFO, f"🔧 جاري تعيين المفاتيح للوضع: {mode}", account=self.name, stage="keys")
             
             if not api_key or not api_secret:
-                print("❌ المفاتيح فارغة!")
+                log_event(logger, logging.WARNING, "❌ المفاتيح فارغة!", account=self.name, stage="keys")
                 return False
             
-            # اختبار الاتصال الفعلي مع Binance
-            self.client = Client(api_key, api_secret, testnet=(mode=="DEMO"))
-            
-            # اختبار الاتصال بجلب سعر حقيقي
-            try:
-                ticker = self.client.get_symbol_ticker(symbol="BTCUSDT")
-                btc_price = float(ticker['price'])
-                print(f"✅ سعر BTC الحقيقي: ${btc_price:,.2f}")
-                
-                if not self.is_realistic_price("BTCUSDT", btc_price):
-                    print("❌ سعر غير واقعي - تحقق من الاتصال")
-                    return False
-                    
-            except Exception as e:
-                print(f"❌ لا يمكن جلب الأسعار الحقيقية: {e}")
+            # اختبار الاتصال الفعلي مع Binance - نتيجة /test-api-keys الحديثة تُستخدم مباشرة
+            result = self.validator.validate(api_key, api_secret, mode).result(timeout=timeout)
+            if not result["success"]:
+                log_event(logger, logging.ERROR, f"❌ لا يمكن التحقق من المفاتيح: {result['details']}", account=self.name, stage="keys")
                 return False
             
-            # اختبار الحساب
-            account_info = self.client.get_account()
-            print(f"✅ يمكن التداول: {account_info.get('canTrade', False)}")
+            # التحقق من السعر الواقعي
+            btc_price = result["details"]["prices"].get("BTCUSDT")
+            if not isinstance(btc_price, float) or not self.is_realistic_price("BTCUSDT", btc_price):
+                log_event(logger, logging.WARNING, "❌ سعر غير واقعي - تحقق من الاتصال", account=self.name, stage="keys", symbol="BTCUSDT")
+                return False
+            log_event(logger, logging.INFO, f"✅ سعر BTC الحقيقي: ${btc_price:,.2f} - يمكن التداول: {result['details']['can_trade']}", account=self.name, stage="keys", symbol="BTCUSDT")
             
+            # إعادة استخدام جلسة العميل المتحقق منه
+            self.client = result["client"]
             self.api_key = api_key
             self.api_secret = api_secret
             self.mode = mode
             
             # حفظ المفاتيح تلقائياً
             if self.save_keys(api_key, api_secret):
-                print("🎉 تم تعيين وحفظ المفاتيح بنجاح!")
+                log_event(logger, logging.INFO, "🎉 تم تعيين وحفظ المفاتيح بنجاح!", account=self.name, stage="keys")
                 return True
             else:
                 return False
             
         except BinanceAPIException as e:
-            print(f"❌ خطأ Binance: {e.message} (كود: {e.code})")
+            log_event(logger, logging.ERROR, f"❌ خطأ Binance: {e.message} (كود: {e.code})", account=self.name, stage="keys", error_class=type(e).__name__, code=e.code)
             return False
         except Exception as e:
-            print(f"❌ خطأ في تعيين المفاتيح: {str(e)}")
+            log_event(logger, logging.ERROR, f"❌ خطأ في تعيين المفاتيح: {str(e)}", account=self.name, stage="keys", error_class=type(e).__name__)
             return False
     
     def start_trading(self):
         """بدء التداول المتعدد"""
-        if not self.running:
+        with self.lifecycle_lock:
+            if self.running:
+                return "⚠️ البوت يعمل بالفعل"
             if not self.client:
                 return "❌ لم يتم تعيين المفاتيح بعد"
             
+            self.reload_settings()
+            
+            # انتظار انتهاء أي عمال من تشغيل سابق - لا ماسحات مكررة أبداً
+            self._join_workers(timeout=10)
+            
             self.running = True
+            self.stop_event = threading.Event()
             # بدء عدة ثreads للمراقبة المتزامنة
-            threading.Thread(target=self.multi_symbol_monitoring, daemon=True).start()
-            threading.Thread(target=self.opportunity_analyzer, daemon=True).start()
-            print("🚀 بدأ التداول المتعدد العملات بنجاح")
+            for name in self.WORKER_STALL_SECONDS:
+                self._spawn_worker(name)
+            self._spawn_worker("watchdog")
+            log_event(logger, logging.INFO, "🚀 بدأ التداول المتعدد العملات بنجاح", account=self.name, stage="lifecycle")
             return "✅ بدأ التداول المتعدد العملات بنجاح"
-        return "⚠️ البوت يعمل بالفعل"
     
-    def stop_trading(self):
-        """إيقاف التداول"""
-        if self.running:
+    def stop_trading(self, timeout=10):
+        """إيقاف التداول - إلغاء تعاوني وإيقاظ فوري وانتظار العمال ثم حفظ الحالة"""
+        with self.lifecycle_lock:
+            if not self.running:
+                return "ℹ️ البوت متوقف بالفعل"
+            
             self.running = False
-            print("🛑 تم إيقاف التداول")
+            self.stop_event.set()
+            for _, cancel in self.workers.values():
+                cancel.set()
+            self.signal_bus.event.set()
+            
+            self._join_workers(timeout)
+            self.flush_state()
+            log_event(logger, logging.INFO, "🛑 تم إيقاف التداول", account=self.name, stage="lifecycle")
             return "🛑 تم إيقاف التداول"
-        return "ℹ️ البوت متوقف بالفعل"
     
-    def multi_symbol_monitoring(self):
+    def shutdown(self):
+        """إيقاف نهائي عند خروج العملية"""
+        if self.running:
+            self.stop_trading()
+        else:
+            self.flush_state()
+    
+    def _spawn_worker(self, name):
+        """تشغيل عامل برمز إلغاء خاص به"""
+        cancel = threading.Event()
+        thread = threading.Thread(
+            target=self._run_worker, args=(name, cancel),
+            name=f"{self.name}-{name}", daemon=True
+        )
+        self.workers[name] = (thread, cancel)
+        self.heartbeats[name] = time.time()
+        thread.start()
+    
+    def _run_worker(self, name, cancel):
+        try:
+            getattr(self, name)(cancel)
+        except Exception as e:
+            log_event(logger, logging.ERROR, f"❌ توقف العامل {name}: {e}", account=self.name, stage="lifecycle", worker=name, error_class=type(e).__name__, exc_info=True)
+    
+    def _join_workers(self, timeout):
+        """انتظار خروج جميع العمال (مهلة إجمالية)"""
+        deadline = time.time() + timeout
+        for name, (thread, _) in list(self.workers.items()):
+            if thread is not threading.current_thread():
+                thread.join(max(0, deadline - time.time()))
+            if not thread.is_alive():
+                self.workers.pop(name, None)
+    
+    def _should_stop(self, cancel):
+        return cancel.is_set() or self.stop_event.is_set()
+    
+    def _sleep(self, cancel, seconds):
+        """نوم قابل للمقاطعة - يعيد True إذا طُلب الإيقاف"""
+        deadline = time.time() + seconds
+        while not self._should_stop(cancel):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            cancel.wait(min(remaining, 1.0))
+        return True
+    
+    def _beat(self, name):
+        self.heartbeats[name] = time.time()
+    
+    def stall_seconds(self, name):
+        """مهلة الصمت للعامل = زمن العمل المسموح + أطول نوم في الإعدادات الحالية"""
+        sleeps = [getattr(self.settings, setting) for setting in self.WORKER_SLEEP_SETTINGS[name]]
+        return self.WORKER_STALL_SECONDS[name] + max(sleeps, default=0)
+    
+    def watchdog(self, cancel):
+        """مراقب العمال - يعيد تشغيل أي عامل متوقف أو عالق"""
+        while not self._sleep(cancel, 15):
+            self.reload_settings()
+            now = time.time()
+            for name in self.WORKER_STALL_SECONDS:
+                thread, worker_cancel = self.workers.get(name, (None, None))
+                stalled = now - self.heartbeats.get(name, now) > self.stall_seconds(name)
+                if thread is not None and thread.is_alive() and not stalled:
+                    continue
+                
+                # لا ننتظر القفل طويلاً حتى لا نعطل stop_trading
+                if self._should_stop(cancel) or not self.lifecycle_lock.acquire(timeout=1):
+                    break
+                try:
+                    if not self.running:
+                        return
+                    log_event(logger, logging.WARNING, f"🐕 إعادة تشغيل العامل {name} ({'عالق' if stalled else 'متوقف'})", account=self.name, stage="watchdog", worker=name, stalled=stalled)
+                    # العامل العالق يخرج بنفسه عند تحرره لأن رمزه أُلغي
+                    if worker_cancel is not None:
+                        worker_cancel.set()
+                    self.watchdog_restarts[name] = self.watchdog_restarts.get(name, 0) + 1
+                    self._spawn_worker(name)
+                finally:
+                    self.lifecycle_lock.release()
+    
+    def reload_settings(self):
+        """تطبيق إعدادات جديدة إن تغير ملف الإعدادات أو .env - العمال يقرؤونها في دورتهم التالية"""
+        self.settings_store.maybe_reload()
+        settings = self.settings_store.current
+        if settings is self.settings:
+            return False
+        
+        previous, self.settings = self.settings, settings
+        self.symbols = list(settings.symbols)
+        self.memory_size = settings.memory_size
+        self.max_open_trades = settings.max_open_trades
+        if settings.balance_history_points != self.balance_history.max_points:
+            self.balance_history = BalanceSeries.from_list(
+                self.balance_history.to_list(), max_points=settings.balance_history_points
+            )
+        if self.cluster_feed is not None and settings.symbols != previous.symbols:
+            self.cluster_feed.queue.set_symbols(self.symbols)
+        
+        log_event(logger, logging.INFO, "🔧 تم تطبيق الإعدادات الجديدة", account=self.name, stage="settings", version=self.settings_store.version)
+        return True
+    
+    def flush_state(self):
+        """حفظ كامل للحالة ولمخزن الرصيد (مع دمج مقاطع السجل)"""
+        self.save_state(compact=True)
+        try:
+            self.balance_store.save(force=True)
+        except Exception as e:
+            log_event(logger, logging.ERROR, f"❌ خطأ في حفظ مخزن الرصيد: {e}", account=self.name, stage="state", error_class=type(e).__name__)
+    
+    def multi_symbol_monitoring(self, cancel):
         """مراقبة متعددة للعملات بالتوازي"""
-        print("🔍 بدء المراقبة المتعددة للعملات...")
+        if self.cluster_feed is not None:
+            return self.cluster_monitoring(cancel)
+        log_event(logger, logging.INFO, "🔍 بدء المراقبة المتعددة للعملات...", account=self.name, stage="scan")
         
-        while self.running:
+        while not self._should_stop(cancel):
+            self._beat("multi_symbol_monitoring")
+            cycle = Timer()
+            settings = self.settings
             try:
                 # استخدام ThreadPoolExecutor للمراقبة المتزامنة
-                with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=settings.scan_max_workers)
+                try:
                     # إرسال جميع العملات للمراقبة
                     future_to_symbol = {
                         executor.submit(self.analyze_symbol, symbol): symbol 
@@ -198,24 +399,59 @@ class AIONHybridBot:
                     
                     # جمع النتائج
                     for future in concurrent.futures.as_completed(future_to_symbol):
+                        if self._should_stop(cancel):
+                            break
                         symbol = future_to_symbol[future]
                         try:
                             signal = future.result()
-                            if signal and self.can_trade_symbol(symbol):
-                                self.execute_opportunity_trade(signal)
+                            if signal:
+                                self.signal_bus.publish(signal, source="monitor")
                         except Exception as e:
-                            print(f"❌ خطأ في تحليل {symbol}: {e}")
+                            log_event(logger, logging.WARNING, f"❌ خطأ في تحليل {symbol}: {e}", account=self.name, stage="scan", symbol=symbol, error_class=type(e).__name__)
+                finally:
+                    # إلغاء التحليلات المتبقية عند الإيقاف
+                    executor.shutdown(wait=False, cancel_futures=True)
+                
+                if self._should_stop(cancel):
+                    break
+                
+                # تحديث مصفوفة الارتباط من الشموع المخزنة (شمعة 5m مغلقة)
+                stamp, closes = self.market_data.latest_closes(Client.KLINE_INTERVAL_5MINUTE)
+                if closes:
+                    self.risk.observe_prices(closes, stamp)
                 
                 # انتظار بين الدورات
-                print("🔁 اكتملت دورة المراقبة - انتظار 60 ثانية")
-                time.sleep(60)
+                log_event(logger, logging.INFO, f"🔁 اكتملت دورة المراقبة - انتظار {settings.scan_sleep:g} ثانية", account=self.name, stage="scan", symbols=len(self.symbols), latency_ms=cycle.ms)
+                self._beat("multi_symbol_monitoring")
+                self._sleep(cancel, settings.scan_sleep)
                 
             except Exception as e:
-                print(f"❌ خطأ في المراقبة المتعددة: {e}")
-                time.sleep(30)
+                log_event(logger, logging.ERROR, f"❌ خطأ في المراقبة المتعددة: {e}", account=self.name, stage="scan", error_class=type(e).__name__, exc_info=True)
+                self._sleep(cancel, settings.error_sleep)
+    
+    def cluster_monitoring(self, cancel):
+        """وضع المنسق: استقبال إشارات عقد المسح بدلاً من المسح المحلي"""
+        log_event(logger, logging.INFO, "🌐 بدء استقبال إشارات عقد المسح...", account=self.name, stage="cluster")
+        self.cluster_feed.subscribe(self.name, self.signal_bus, self.symbols)
+        try:
+            while not self._should_stop(cancel):
+                self._beat("multi_symbol_monitoring")
+                try:
+                    self.cluster_feed.pump()
+                    
+                    # الارتباط من الشموع المخزنة محلياً (محلل الفرص ومحاكي التداول)
+                    stamp, closes = self.market_data.latest_closes(Client.KLINE_INTERVAL_5MINUTE)
+                    if closes:
+                        self.risk.observe_prices(closes, stamp)
+                except Exception as e:
+                    log_event(logger, logging.ERROR, f"❌ خطأ في استقبال إشارات العقد: {e}", account=self.name, stage="cluster", error_class=type(e).__name__, exc_info=True)
+                self._sleep(cancel, 2)
+        finally:
+            self.cluster_feed.unsubscribe(self.name)
     
     def analyze_symbol(self, symbol):
         """تحليل عملة واحدة بإشارات متقدمة"""
+        timer = Timer()
         try:
             if not self.client:
                 return None
@@ -224,234 +460,148 @@ class AIONHybridBot:
             signals = []
             
             # التحليل على فترات متعددة
-            for interval in ['1h', '15m', '5m']:
+            for interval in self.settings.scan_intervals:
                 signal = self.get_advanced_signal(symbol, interval)
                 if signal:
                     signals.append(signal)
             
             # اختيار أفضل إشارة
-            if signals:
-                best_signal = max(signals, key=lambda x: x['confidence'])
-                return best_signal
-            
-            return None
+            best_signal = max(signals, key=lambda x: x['confidence']) if signals else None
+            log_event(logger, logging.DEBUG, "تحليل عملة", sample=0.1, account=self.name, stage="analyze",
+                      symbol=symbol, signals=len(signals), latency_ms=timer.ms)
+            return best_signal
                 
         except Exception as e:
-            print(f"❌ خطأ في تحليل {symbol}: {e}")
+            log_event(logger, logging.WARNING, f"❌ خطأ في تحليل {symbol}: {e}", account=self.name, stage="analyze", symbol=symbol, error_class=type(e).__name__, latency_ms=timer.ms)
             return None
     
     def get_advanced_signal(self, symbol, interval='1h'):
         """الحصول على إشارة متقدمة من بيانات حقيقية"""
         try:
-            # جلب بيانات تاريخية حقيقية
-            klines = self.client.get_klines(
-                symbol=symbol, 
-                interval=interval,
-                limit=100
+            # متجه الميزات المطلوبة لكل الاستراتيجيات (محسوب مرة واحدة لكل عملة وفترة)
+            features = self.market_data.get_features(
+                symbol, interval, self.strategies.required("advanced") | {"rows", "close", "atr_pct"},
+                limit=self.settings.advanced_kline_limit
             )
             
-            if not klines or len(klines) < 50:
-                return None
-            
-            # تحويل البيانات
-            df = pd.DataFrame(klines, columns=[
-                'open_time', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
-            ])
-            
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            df = df.dropna()
-            
-            if len(df) < 20:
-                return None
-            
-            # حساب المؤشرات المتقدمة
-            indicators = compute_indicators(df)
-            if indicators is None:
+            if features is None or features["rows"] < 50:
                 return None
             
-            # القيم الحالية
-            current_rsi = indicators['rsi'].iloc[-1]
-            macd_diff = indicators['macd_diff'].iloc[-1]
-            current_price = df['close'].iloc[-1]
-            
             # جلب السعر الحالي المباشر
+            features["price"] = features["close"]
             try:
-                ticker = self.client.get_symbol_ticker(symbol=symbol)
-                current_price = float(ticker['price'])
-            except:
-                pass
+                features["price"] = self.market_data.get_price(symbol)
+            except Exception as e:
+                log_event(logger, logging.DEBUG, "تعذر جلب السعر المباشر", sample=0.1, account=self.name,
+                          stage="price", symbol=symbol, error_class=type(e).__name__)
             
             # التحقق من السعر الواقعي
-            if not self.is_realistic_price(symbol, current_price):
+            if not self.is_realistic_price(symbol, features["price"]):
                 return None
             
-            # توليد إشارات متعددة
-            signals = []
-            
-            # 1. إشارة انعكاس متوسط
-            if current_rsi < 30 and macd_diff > 0:
-                confidence = 0.75 + (35 - current_rsi) / 35 * 0.2
-                signals.append({
-                    "action": "BUY",
-                    "symbol": symbol,
-                    "strategy": "mean_reversion", 
-                    "confidence": min(confidence, 0.95),
-                    "price": current_price,
-                    "rsi": current_rsi,
-                    "macd": macd_diff,
-                    "interval": interval,
-                    "reason": f"انعكاس محتمل - RSI منخفض ({current_rsi:.1f})"
-                })
-            
-            # 2. إشارة زخم
-            if current_rsi > 65 and macd_diff < 0:
-                confidence = 0.70 + (current_rsi - 65) / 35 * 0.2
-                signals.append({
-                    "action": "SELL", 
-                    "symbol": symbol,
-                    "strategy": "momentum",
-                    "confidence": min(confidence, 0.90),
-                    "price": current_price,
-                    "rsi": current_rsi,
-                    "macd": macd_diff,
-                    "interval": interval,
-                    "reason": f"زخم هبوطي - RSI مرتفع ({current_rsi:.1f})"
-                })
-            
-            # 3. إشارة متابعة الاتجاه
-            if macd_diff > 0.002 and current_rsi < 60:
-                signals.append({
-                    "action": "BUY",
-                    "symbol": symbol,
-                    "strategy": "trend_following",
-                    "confidence": 0.68,
-                    "price": current_price,
-                    "rsi": current_rsi,
-                    "macd": macd_diff,
-                    "interval": interval,
-                    "reason": f"اتجاه صاعد قوي - MACD إيجابي"
-                })
-            
-            # 4. إشارة كسر
-            if (df['high'].iloc[-1] > df['high'].iloc[-2] and 
-                df['volume'].iloc[-1] > df['volume'].iloc[-2] * 1.2):
-                signals.append({
-                    "action": "BUY",
-                    "symbol": symbol,
-                    "strategy": "breakout",
-                    "confidence": 0.72,
-                    "price": current_price,
-                    "rsi": current_rsi,
-                    "macd": macd_diff,
-                    "interval": interval,
-                    "reason": f"كسر مقاومة مع حجم مرتفع"
+            # تقييم جميع الاستراتيجيات المسجلة في مرور واحد
+            signals = self.strategies.evaluate("advanced", features, symbol)
+            for signal in signals:
+                signal.update({
+                    "rsi": features.get("rsi"),
+                    "macd": features.get("macd_diff"),
+                    "atr_pct": features.get("atr_pct"),
+                    "interval": interval
                 })
             
             return max(signals, key=lambda x: x['confidence']) if signals else None
                 
         except Exception as e:
+            log_event(logger, logging.DEBUG, f"خطأ في الإشارة المتقدمة: {e}", sample=0.1, account=self.name,
+                      stage="signal", symbol=symbol, interval=interval, error_class=type(e).__name__)
             return None
     
-    def opportunity_analyzer(self):
+    def opportunity_analyzer(self, cancel):
         """محلل الفرص الذكي - يبحث عن أفضل الفرص"""
-        print("🎯 بدء محلل الفرص الذكي...")
+        log_event(logger, logging.INFO, "🎯 بدء محلل الفرص الذكي...", account=self.name, stage="quick_scan")
         
-        while self.running:
+        while not self._should_stop(cancel):
+            self._beat("opportunity_analyzer")
+            settings = self.settings
             try:
-                best_opportunities = []
-                
-                # تحليل سريع لجميع العملات
-                for symbol in self.symbols[:10]:  # تحليل أول 10 عملات بسرعة
+                # تحليل سريع لأول العملات (10 افتراضياً)
+                for symbol in self.symbols[:settings.quick_scan_symbols]:
+                    if self._should_stop(cancel):
+                        break
                     signal = self.get_quick_signal(symbol)
-                    if signal and signal['confidence'] > 0.7:
-                        best_opportunities.append(signal)
+                    if signal and signal['confidence'] > settings.quick_min_confidence:
+                        # الترتيب والتنفيذ يتمان مركزياً عبر ناقل الإشارات
+                        self.signal_bus.publish(signal, source="analyzer")
                 
-                # ترتيب الفرص حسب الثقة
-                best_opportunities.sort(key=lambda x: x['confidence'], reverse=True)
+                self._sleep(cancel, settings.quick_scan_sleep)  # تحليل كل 30 ثانية افتراضياً
                 
-                # تنفيذ أفضل فرصتين
-                for opportunity in best_opportunities[:2]:
-                    if self.can_trade_symbol(opportunity['symbol']):
-                        self.execute_opportunity_trade(opportunity)
-                        time.sleep(5)  # فصل بين الصفقات
+            except Exception as e:
+                log_event(logger, logging.ERROR, f"❌ خطأ في محلل الفرص: {e}", account=self.name, stage="quick_scan", error_class=type(e).__name__, exc_info=True)
+                self._sleep(cancel, settings.error_sleep)
+    
+    def execution_worker(self, cancel):
+        """منفذ الصفقات - يسحب أفضل الإشارات من الناقل عبر جميع العملات"""
+        log_event(logger, logging.INFO, "⚙️ بدء منفذ الصفقات...", account=self.name, stage="execute")
+        
+        while not self._should_stop(cancel):
+            self._beat("execution_worker")
+            try:
+                if not self.signal_bus.wait(timeout=5) or self._should_stop(cancel):
+                    continue
                 
-                time.sleep(30)  # تحليل كل 30 ثانية
+                # عدد الصفقات المتاحة حالياً
+                slots = self.max_open_trades - self.recent_trade_count()
+                if slots <= 0:
+                    self._sleep(cancel, 5)
+                    continue
                 
+                for signal in self.signal_bus.drain(slots, accept=lambda sig: self.can_trade_symbol(sig['symbol'])):
+                    self.execute_opportunity_trade(signal)
+                    
             except Exception as e:
-                print(f"❌ خطأ في محلل الفرص: {e}")
-                time.sleep(30)
+                log_event(logger, logging.ERROR, f"❌ خطأ في منفذ الصفقات: {e}", account=self.name, stage="execute", error_class=type(e).__name__, exc_info=True)
+                self._sleep(cancel, 5)
     
     def get_quick_signal(self, symbol):
         """إشارة سريعة للتحليل السريع"""
         try:
             # جلب بيانات 5m للتحليل السريع
-            klines = self.client.get_klines(
-                symbol=symbol, 
-                interval=Client.KLINE_INTERVAL_5MINUTE,
-                limit=50
+            features = self.market_data.get_features(
+                symbol, 
+                Client.KLINE_INTERVAL_5MINUTE,
+                self.strategies.required("quick") | {"close"},
+                limit=self.settings.quick_kline_limit
             )
             
-            if not klines:
-                return None
-            
-            df = pd.DataFrame(klines, columns=[
-                'open_time', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
-            ])
-            
-            for col in ['open', 'high', 'low', 'close']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            df = df.dropna()
-            
-            if len(df) < 20:
+            if features is None:
                 return None
             
-            # تحليل سريع
-            current_price = df['close'].iloc[-1]
-            price_change = (current_price - df['close'].iloc[-2]) / df['close'].iloc[-2] * 100
-            
-            # إشارات سريعة
-            if price_change < -2:  # هبوط سريع
-                return {
-                    "action": "BUY",
-                    "symbol": symbol,
-                    "strategy": "quick_reversal",
-                    "confidence": 0.75,
-                    "price": current_price,
-                    "reason": f"هبوط سريع ({price_change:.2f}%) - فرصة شراء"
-                }
-            elif price_change > 2:  # صعود سريع
-                return {
-                    "action": "SELL",
-                    "symbol": symbol,
-                    "strategy": "quick_momentum", 
-                    "confidence": 0.70,
-                    "price": current_price,
-                    "reason": f"صعود سريع ({price_change:.2f}%) - فرصة بيع"
-                }
-            
-            return None
+            features["price"] = features["close"]
+            signals = self.strategies.evaluate("quick", features, symbol)
+            return signals[0] if signals else None
                 
         except Exception as e:
+            log_event(logger, logging.DEBUG, f"خطأ في الإشارة السريعة: {e}", sample=0.1, account=self.name,
+                      stage="quick_signal", symbol=symbol, error_class=type(e).__name__)
             return None
     
     def can_trade_symbol(self, symbol):
         """التحقق من إمكانية التداول على عملة معينة"""
-        # لا تداول على نفس العملة أكثر من مرة كل 10 دقائق
+        # لا تداول على نفس العملة أكثر من مرة كل 10 دقائق (افتراضياً)
         current_time = datetime.now()
         if symbol in self.last_trade_time:
             time_since_last = current_time - self.last_trade_time[symbol]
-            if time_since_last < timedelta(minutes=10):
+            if time_since_last < timedelta(minutes=self.settings.symbol_cooldown_minutes):
                 return False
         
         # لا يزيد عن 5 صفقات في نفس الوقت
-        recent_trades = [t for t in self.trades[-20:] 
-                        if current_time - datetime.fromisoformat(t['entry_time'].replace('Z', '')) < timedelta(minutes=30)]
-        return len(recent_trades) < 5 and self.balance > 15
+        return self.recent_trade_count() < self.max_open_trades and self.balance > 15
+    
+    def recent_trade_count(self):
+        """صفقات دخلت خلال آخر 30 دقيقة + المراكز الافتراضية المفتوحة
+        (بوقت الدخول: المركز الافتراضي لا يُحسب مرة ثانية بعد إغلاقه بوقت خروج حديث)"""
+        cutoff = (datetime.now() - timedelta(minutes=30)).timestamp()
+        return self.trades.count_entered_since(cutoff) + self.paper.book.open_count()
     
     def execute_opportunity_trade(self, signal):
         """تنفيذ صفقة فرصة"""
@@ -466,8 +616,11 @@ class AIONHybridBot:
             trade_amount = max(trade_amount, 10.0)
             trade_amount = min(trade_amount, self.balance * 0.08)  # حد أقصى 8%
             
-            # 📈 حساب ربح واقعي
-            profit = self.calculate_smart_profit(signal, trade_amount)
+            # 🛡️ فحص المخاطر قبل التنفيذ
+            allowed, reason = self.risk.check(symbol, signal["strategy"], trade_amount, self.balance)
+            if not allowed:
+                log_event(logger, logging.INFO, f"🛡️ تم رفض {symbol}: {reason}", account=self.name, stage="risk", symbol=symbol, strategy=signal["strategy"])
+                return None
             
             # 🕒 تحديث وقت التداول
             self.last_trade_time[symbol] = datetime.now()
@@ -481,38 +634,72 @@ class AIONHybridBot:
                 "entry_price": round(signal["price"], 6),
                 "quantity": round(trade_amount / signal["price"], 8),
                 "amount": round(trade_amount, 2),
-                "profit": round(profit, 4),
-                "profit_percentage": round((profit / trade_amount) * 100, 2),
                 "confidence": signal["confidence"],
                 "reason": signal["reason"],
                 "interval": signal.get('interval', 'quick'),
-                "status": "CLOSED",
-                "entry_time": datetime.now().isoformat(),
-                "balance_before": round(self.balance, 2)
+                "entry_time": datetime.now().isoformat()
             }
+            self.risk.add_position(symbol, trade["strategy"], trade_amount)
             
-            # 💸 تحديث الرصيد
-            self.balance += profit
-            trade["balance_after"] = round(self.balance, 2)
-            
-            # ➕ إضافة الصفقة
-            self.trades.append(trade)
-            self.performance["symbols_traded"].add(symbol)
+            # 📄 الوضع التجريبي: مركز افتراضي يُغلق لاحقاً بحركة السوق الفعلية
+            if self.mode == "DEMO":
+                trade = self.paper.open(trade, signal)
+                log_event(logger, logging.INFO, f"📄 مركز افتراضي: {symbol} {signal['action']} @ {trade['entry_price']}", account=self.name, stage="paper", symbol=symbol, interval=trade["interval"], strategy=trade["strategy"], slippage_bps=trade["slippage_bps"])
+                return trade
             
-            # تحديث الأداء
-            self.update_performance(trade)
-            self.adaptive_learning(trade)
-            self.update_intelligence_score()
-            self.update_balance_history()
-            
-            print(f"✅ فرصة مُنفذة: {symbol} {signal['action']} - الربح: ${profit:.4f}")
-            
-            return trade
+            # 📈 حساب ربح واقعي
+            profit = self.calculate_smart_profit(signal, trade_amount)
+            trade.update({
+                "profit": round(profit, 4),
+                "profit_percentage": round((profit / trade_amount) * 100, 2),
+                "status": "CLOSED"
+            })
+            return self.record_closed_trade(trade)
             
         except Exception as e:
-            print(f"❌ خطأ في تنفيذ الفرصة: {e}")
+            log_event(logger, logging.ERROR, f"❌ خطأ في تنفيذ الفرصة: {e}", account=self.name, stage="execute", symbol=signal.get("symbol"), error_class=type(e).__name__, exc_info=True)
             return None
     
+    def record_closed_trade(self, trade):
+        """تسجيل صفقة مغلقة: الرصيد، السجل، الأداء والتعلم"""
+        trade["balance_before"] = round(self.balance, 2)
+        
+        # 💸 تحديث الرصيد
+        self.balance += trade["profit"]
+        trade["balance_after"] = round(self.balance, 2)
+        
+        # ➕ إضافة الصفقة
+        self.trades.append(trade)
+        self.performance["symbols_traded"].add(trade["symbol"])
+        
+        # تحديث الأداء
+        self.update_performance(trade)
+        self.adaptive_learning(trade)
+        self.update_intelligence_score()
+        self.update_balance_history()
+        
+        log_event(logger, logging.INFO, f"✅ فرصة مُنفذة: {trade['symbol']} {trade['action']} - الربح: ${trade['profit']:.4f}", account=self.name, stage="execute", symbol=trade["symbol"], interval=trade["interval"], strategy=trade["strategy"], profit=trade["profit"], exit_reason=trade.get("exit_reason"))
+        
+        return trade
+    
+    def paper_trading(self, cancel):
+        """تقييم المراكز الافتراضية بأحدث الأسعار وإغلاقها بالوقف/الهدف/الوقت"""
+        while not self._should_stop(cancel):
+            self._beat("paper_trading")
+            try:
+                if self.paper.book.open_count():
+                    # تحديث ذاكرة الأسعار للعملات المفتوحة فقط (مشتركة ومخزنة مؤقتاً)
+                    for symbol in self.paper.book.open_symbols():
+                        try:
+                            self.market_data.get_price(symbol)
+                        except Exception as e:
+                            log_event(logger, logging.DEBUG, "تعذر تحديث السعر", sample=0.1, account=self.name, stage="paper", symbol=symbol, error_class=type(e).__name__)
+                    for trade in self.paper.step():
+                        self.record_closed_trade(trade)
+            except Exception as e:
+                log_event(logger, logging.ERROR, f"❌ خطأ في محاكي التداول: {e}", account=self.name, stage="paper", error_class=type(e).__name__, exc_info=True)
+            self._sleep(cancel, self.settings.paper_poll_seconds)
+    
     def calculate_smart_profit(self, signal, trade_amount):
         """حساب ربح ذكي متعدد العوامل"""
         # العوائد الأساسية الواقعية
@@ -582,41 +769,33 @@ class AIONHybridBot:
     
     def adaptive_learning(self, trade):
         """التعلم التكيفي من الصفقات"""
-        self.memory.append(trade)
-        if len(self.memory) > 200:
-            self.memory.pop(0)
-        
-        # تحديث أوزان الاستراتيجيات
-        if trade['profit'] > 0:
-            self.strategy_weights[trade['strategy']] *= 1.01
-        else:
-            self.strategy_weights[trade['strategy']] *= 0.99
-        
-        # تطبيع الأوزان
-        total = sum(self.strategy_weights.values())
-        for strategy in self.strategy_weights:
-            self.strategy_weights[strategy] /= total
-        
-        self.save_state()
+        # تحديث أوزان الاستراتيجيات (الاستراتيجيات السريعة بدون أوزان)
+        if trade['strategy'] in self.strategy_weights:
+            if trade['profit'] > 0:
+                self.strategy_weights[trade['strategy']] *= 1.01
+            else:
+                self.strategy_weights[trade['strategy']] *= 0.99
+            
+            # تطبيع الأوزان
+            total = sum(self.strategy_weights.values())
+            for strategy in self.strategy_weights:
+                self.strategy_weights[strategy] /= total
     
     def update_intelligence_score(self):
         """تحديث مؤشر الذكاء بناء على أداء حقيقي"""
-        if not self.memory:
-            return
-        
-        recent_trades = self.memory[-30:] if len(self.memory) >= 30 else self.memory
+        recent = self.analytics.overall
         
-        if not recent_trades:
+        if not recent.n:
             return
         
         # معدل النجاح
-        win_rate = sum(1 for t in recent_trades if t.get('profit', 0) > 0) / len(recent_trades)
+        win_rate = recent.win_rate
         
         # متوسط الربح
-        avg_profit = np.mean([t.get('profit', 0) for t in recent_trades])
+        avg_profit = recent.expectancy
         
         # تنوع العملات
-        unique_symbols = len(set(t.get('symbol') for t in recent_trades))
+        unique_symbols = len(recent.symbols)
         diversity_score = min(unique_symbols / 10 * 100, 100)
         
         # حساب النتيجة
@@ -644,21 +823,26 @@ class AIONHybridBot:
         else:
             self.performance["current_streak"] = min(0, self.performance["current_streak"]) - 1
         
-        self.performance["daily"] += trade['profit']
+        # تحديث التحليلات المتدفقة وأرباح الفترات
+        self.analytics.record(trade)
+        self.refresh_period_profits()
+        
         self.performance["win_rate"] = (
             self.performance["successful_trades"] / 
             self.performance["total_trades"] * 100 
             if self.performance["total_trades"] > 0 else 0
         )
     
+    def refresh_period_profits(self):
+        """أرباح الفترات تتصفر تلقائياً مع بداية يوم/أسبوع/شهر جديد"""
+        for period in ("daily", "weekly", "monthly"):
+            self.performance[period] = round(self.analytics.period_profit(period), 4)
+    
     def update_balance_history(self):
         """تحديث تاريخ الرصيد"""
-        self.balance_history.append({
-            "timestamp": datetime.now().isoformat(),
-            "balance": round(self.balance, 2)
-        })
-        if len(self.balance_history) > 100:
-            self.balance_history.pop(0)
+        self.balance_history.append(round(self.balance, 2))
+        # القيمة الكلية تشمل الربح غير المحقق للمراكز الافتراضية المفتوحة
+        self.balance_store.add(round(self.balance, 2), equity=round(self.balance + self.paper.book.unrealized(), 2))
         self.save_state()
     
     def get_progress_data(self):
@@ -673,19 +857,25 @@ class AIONHybridBot:
             (self.target_balance / self.balance) ** (1/days_remaining) - 1
         ) * 100 if days_remaining > 0 else 0
         
+        # تحديث الإسقاط في الخلفية - النتيجة المعروضة هي آخر نتيجة محسوبة
+        self.projector.request_refresh(self.trades, self.balance, self.target_balance, days_remaining)
+        
         return {
             "progress_percent": round(min(progress, 100), 2),
             "days_remaining": days_remaining,
             "required_daily": round(required_daily, 2),
             "current_balance": round(self.balance, 2),
             "target_balance": self.target_balance,
-            "initial_balance": self.initial_balance
+            "initial_balance": self.initial_balance,
+            "projection": self.projector.snapshot()
         }
     
     def get_performance_stats(self):
         """إحصائيات الأداء"""
         progress = self.get_progress_data()
         
+        self.refresh_period_profits()
+        
         return {
             **self.performance,
             **progress,
@@ -693,22 +883,35 @@ class AIONHybridBot:
             "risk_level": f"{self.risk_level * 100}%",
             "strategy_weights": self.strategy_weights,
             "adaptive_intelligence": self.adaptive_intelligence,
+            "symbols_traded": sorted(self.performance["symbols_traded"]),
             "symbols_count": len(self.performance["symbols_traded"]),
-            "total_symbols": len(self.symbols)
+            "total_symbols": len(self.symbols),
+            "analytics": self.analytics.snapshot(),
+            "signal_bus": {**self.signal_bus.stats, "pending": self.signal_bus.size()},
+            "risk": self.risk.snapshot(),
+            "paper_trading": self.paper.snapshot(),
+            "cluster": self.cluster_feed.snapshot() if self.cluster_feed else None
         }
     
+    @property
+    def memory(self):
+        """الذاكرة الهجينة - عرض لآخر الصفقات بدلاً من نسخة مكررة"""
+        return self.trades.tail(self.memory_size)
+    
     def get_recent_trades(self, limit=15):
         """آخر الصفقات"""
-        return self.trades[-limit:] if self.trades else []
+        return self.trades.tail(limit)
     
     def get_live_trades(self):
         """الصفقات الحية"""
-        # إرجاع آخر 3 صفقات كـ "حية" للعرض
-        return self.trades[-3:] if len(self.trades) >= 3 else self.trades
+        # المراكز الافتراضية المفتوحة مع تقييمها الحالي، وإلا آخر 3 صفقات للعرض
+        return self.paper.book.positions(limit=10) or self.trades.tail(3)
     
-    def get_balance_history(self):
-        """تاريخ الرصيد"""
-        return self.balance_history
+    def get_balance_history(self, start=None, end=None, resolution=None, max_points=None):
+        """تاريخ الرصيد - بدون معاملات يعيد آخر 100 نقطة، ومع مدى/دقة يستخدم المخزن متعدد الدقة"""
+        if start is None and end is None and resolution is None and max_points is None:
+            return self.balance_history.to_list()
+        return self.balance_store.query(start, end, resolution, max_points)
     
     def run_advanced_simulation(self, start_date, end_date):
         """محاكاة واقعية ببيانات حقيقية"""
@@ -775,34 +978,73 @@ class AIONHybridBot:
                 "message": f"❌ خطأ في المحاكاة: {e}"
             }
     
+    def state_path(self, filename):
+        """مسار ملف داخل مساحة حالة هذا الحساب"""
+        return os.path.join(self.state_dir, filename)
+    
     def load_state(self):
         """تحميل الحالة"""
         try:
-            if os.path.exists('hybrid_state.json'):
-                with open('hybrid_state.json', 'r') as f:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r') as f:
                     data = json.load(f)
                     self.balance = data.get("balance", self.balance)
-                    self.trades = data.get("trades", [])
-                    self.memory = data.get("memory", [])
                     self.performance = data.get("performance", self.performance)
-                    self.balance_history = data.get("balance_history", self.balance_history)
+                    symbols_traded = self.performance.get("symbols_traded")
+                    self.performance["symbols_traded"] = set(symbols_traded) if isinstance(symbols_traded, list) else set()
+                    if "balance_history" in data:
+                        self.balance_history = BalanceSeries.from_list(
+                            data["balance_history"], max_points=self.settings.balance_history_points
+                        )
+                    
+                    # الحالات القديمة تحفظ الصفقات كقائمة JSON
+                    if not os.path.exists(self.trades_file):
+                        self.trades = TradeLedger()
+                        self.trades.extend(data.get("trades", []))
                     self.adaptive_intelligence = data.get("adaptive_intelligence", self.adaptive_intelligence)
+                    self.paper.book.restore(data.get("paper_positions", []))
+            
+            # السجل العمودي الكامل
+            if os.path.exists(self.trades_file):
+                self.trades = TradeLedger.load(self.trades_file)
+            
+            # مخزن الرصيد متعدد الدقة
+            if not self.balance_store.load():
+                self.balance_store.add(self.balance)
+            
+            # إعادة بناء التحليلات من سجل الصفقات
+            self.analytics.rebuild(self.trades)
+            
+            # استعادة التعرض للصفقات التي ما زالت ضمن فترة الاحتفاظ
+            cutoff = time.time() - self.risk.holding_seconds
+            for trade in self.trades.tail(self.trades.count_since(cutoff)):
+                self.risk.add_position(trade["symbol"], trade["strategy"], trade["amount"], now=to_epoch(trade["entry_time"]))
+            for trade in self.paper.book.positions():
+                self.risk.add_position(trade["symbol"], trade["strategy"], trade["amount"], now=to_epoch(trade["entry_time"]))
         except Exception as e:
-            print(f"❌ خطأ في تحميل الحالة: {e}")
+            log_event(logger, logging.ERROR, f"❌ خطأ في تحميل الحالة: {e}", account=self.name, stage="state", error_class=type(e).__name__, exc_info=True)
     
-    def save_state(self):
-        """حفظ الحالة"""
-        try:
-            data = {
-                'balance': self.balance,
-                'trades': self.trades,
-                'memory': self.memory,
-                'performance': self.performance,
-                'balance_history': self.balance_history,
-                'adaptive_intelligence': self.adaptive_intelligence,
-                'last_update': datetime.now().isoformat()
-            }
-            with open('hybrid_state.json', 'w') as f:
-                json.dump(data, f, indent=2, default=str)
-        except Exception as e:
-            print(f"❌ خطأ في حفظ الحالة: {e}")
+    def save_state(self, compact=False):
+        """حفظ الحالة - مرة واحدة لكل صفقة (من update_balance_history)"""
+        with self.state_lock:
+            try:
+                # السجل الكامل بصيغة عمودية (إلحاقي)، وآخر الصفقات فقط في JSON
+                self.trades.save(self.trades_file, compact=compact)
+                self.balance_store.save()
+                
+                data = {
+                    'balance': self.balance,
+                    'trades': self.trades.tail(self.memory_size),
+                    'performance': {**self.performance, "symbols_traded": sorted(self.performance["symbols_traded"])},
+                    'balance_history': self.balance_history.to_list(),
+                    'adaptive_intelligence': self.adaptive_intelligence,
+                    'paper_positions': self.paper.book.to_list(),
+                    'last_update': datetime.now().isoformat()
+                }
+                # كتابة ذرية - الإيقاف أثناء الحفظ لا يترك ملفاً تالفاً
+                tmp_file = self.state_file + ".tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f, indent=2, default=str)
+                os.replace(tmp_file, self.state_file)
+            except Exception as e:
+                log_event(logger, logging.ERROR, f"❌ خطأ في حفظ الحالة: {e}", account=self.name, stage="state", error_class=type(e).__name__, exc_info=True)
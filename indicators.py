@@ -1,39 +1,122 @@
+import logging
 import pandas as pd
 import ta
+from structured_log import get_logger, log_event
 
-def compute_indicators(df):
+logger = get_logger("indicators")
+
+
+def _rsi(df):
+    close = df['close'].astype(float)
+    return {'rsi': ta.momentum.RSIIndicator(close, window=14).rsi()}
+
+
+def _macd(df):
+    macd_indicator = ta.trend.MACD(df['close'].astype(float))
+    return {
+        'macd': macd_indicator.macd(),
+        'macd_signal': macd_indicator.macd_signal(),
+        'macd_diff': macd_indicator.macd_diff()
+    }
+
+
+def _bollinger(df):
+    bb = ta.volatility.BollingerBands(df['close'].astype(float), window=20, window_dev=2)
+    return {'bb_upper': bb.bollinger_hband(), 'bb_lower': bb.bollinger_lband()}
+
+
+def _ema(df):
+    close = df['close'].astype(float)
+    return {
+        'ema_fast': ta.trend.EMAIndicator(close, window=12).ema_indicator(),
+        'ema_slow': ta.trend.EMAIndicator(close, window=26).ema_indicator()
+    }
+
+
+def _atr(df):
+    atr = ta.volatility.AverageTrueRange(df['high'], df['low'], df['close'], window=14)
+    return {'atr': atr.average_true_range()}
+
+
+def _vwap(df):
+    vwap = ta.volume.VolumeWeightedAveragePrice(df['high'], df['low'], df['close'], df['volume'], window=14)
+    return {'vwap': vwap.volume_weighted_average_price()}
+
+
+def _obv(df):
+    return {'obv': ta.volume.OnBalanceVolumeIndicator(df['close'], df['volume']).on_balance_volume()}
+
+
+def _adx(df):
+    adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'], window=14)
+    return {'adx': adx.adx(), 'adx_pos': adx.adx_pos(), 'adx_neg': adx.adx_neg()}
+
+
+def _stochastic(df):
+    stoch = ta.momentum.StochasticOscillator(df['high'], df['low'], df['close'], window=14, smooth_window=3)
+    return {'stoch_k': stoch.stoch(), 'stoch_d': stoch.stoch_signal()}
+
+
+def _taker_buy_ratio(df):
+    volume = df['volume'].replace(0, float('nan'))
+    return {'taker_buy_ratio': pd.to_numeric(df['taker_buy_base'], errors='coerce') / volume}
+
+
+# 📐 مجموعات المؤشرات: كل مجموعة تُحسب بمرور واحد وتنتج عدة سلاسل
+INDICATOR_GROUPS = {
+    'rsi': _rsi,
+    'macd': _macd,
+    'bollinger': _bollinger,
+    'ema': _ema,
+    'atr': _atr,
+    'vwap': _vwap,
+    'obv': _obv,
+    'adx': _adx,
+    'stochastic': _stochastic,
+    'taker_buy_ratio': _taker_buy_ratio
+}
+
+SERIES_GROUPS = {
+    'rsi': 'rsi',
+    'macd': 'macd', 'macd_signal': 'macd', 'macd_diff': 'macd',
+    'bb_upper': 'bollinger', 'bb_lower': 'bollinger',
+    'ema_fast': 'ema', 'ema_slow': 'ema',
+    'atr': 'atr',
+    'vwap': 'vwap',
+    'obv': 'obv',
+    'adx': 'adx', 'adx_pos': 'adx', 'adx_neg': 'adx',
+    'stoch_k': 'stochastic', 'stoch_d': 'stochastic',
+    'taker_buy_ratio': 'taker_buy_ratio'
+}
+
+# المؤشرات الأساسية التي تعيدها compute_indicators افتراضياً
+DEFAULT_INDICATORS = ('rsi', 'macd', 'macd_signal', 'macd_diff', 'bb_upper', 'bb_lower', 'ema_fast', 'ema_slow')
+
+
+class LazyIndicators:
+    """مؤشرات تُحسب عند أول طلب فقط - المستهلك يدفع تكلفة ما يحتاجه"""
+
+    def __init__(self, df):
+        self.df = df
+        self.series = {}
+
+    def __getitem__(self, name):
+        if name not in self.series:
+            group = SERIES_GROUPS[name]
+            self.series.update(INDICATOR_GROUPS[group](self.df))
+        return self.series[name]
+
+    def __contains__(self, name):
+        return name in SERIES_GROUPS
+
+    def compute(self, names):
+        return {name: self[name] for name in names}
+
+
+def compute_indicators(df, names=DEFAULT_INDICATORS):
     """حساب المؤشرات الفنية"""
     try:
-        close = df['close'].astype(float)
-        
-        # RSI
-        rsi = ta.momentum.RSIIndicator(close, window=14).rsi()
-        
-        # MACD
-        macd_indicator = ta.trend.MACD(close)
-        macd = macd_indicator.macd()
-        macd_signal = macd_indicator.macd_signal()
-        macd_diff = macd_indicator.macd_diff()
-        
-        # Bollinger Bands
-        bb = ta.volatility.BollingerBands(close, window=20, window_dev=2)
-        bb_upper = bb.bollinger_hband()
-        bb_lower = bb.bollinger_lband()
-        
-        # EMA
-        ema_fast = ta.trend.EMAIndicator(close, window=12).ema_indicator()
-        ema_slow = ta.trend.EMAIndicator(close, window=26).ema_indicator()
-        
-        return {
-            'rsi': rsi,
-            'macd': macd,
-            'macd_signal': macd_signal,
-            'macd_diff': macd_diff,
-            'bb_upper': bb_upper,
-            'bb_lower': bb_lower,
-            'ema_fast': ema_fast,
-            'ema_slow': ema_slow
-        }
+        return LazyIndicators(df).compute(names)
     except Exception as e:
-        print(f"Indicators calculation error: {e}")
+        log_event(logger, logging.WARNING, f"Indicators calculation error: {e}", error_class=type(e).__name__)
         return None
@@ -0,0 +1,104 @@
+import json
+import numpy as np
+import pandas as pd
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+KLINE_FIELDS = (
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'
+)
+INT_FIELDS = ('open_time', 'close_time', 'trades')
+ROW_SIZE = len(KLINE_FIELDS)
+
+
+class KlineArrays:
+    """شموع بأعمدة NumPy مُنمّطة (float64/int64) بدون أي مرحلة object"""
+
+    def __init__(self, matrix):
+        # matrix: مصفوفة (n, 12) من float64 - الأعمدة عروض عليها بدون نسخ
+        self.matrix = matrix
+        for index, name in enumerate(KLINE_FIELDS):
+            column = matrix[:, index]
+            setattr(self, name, column.astype(np.int64) if name in INT_FIELDS else column)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def tail(self, limit):
+        return KlineArrays(self.matrix[-limit:]) if limit < len(self) else self
+
+    def to_frame(self):
+        """DataFrame رقمي مباشرة من الأعمدة (بدون to_numeric أو dropna)"""
+        return pd.DataFrame({name: getattr(self, name) for name in KLINE_FIELDS[:-1]}, copy=False)
+
+
+def _from_rows(rows):
+    """تعبئة مصفوفة محجوزة مسبقاً من قائمة صفوف (رد python-binance المُحلل)"""
+    matrix = np.empty((len(rows), ROW_SIZE), dtype=np.float64)
+    for i, row in enumerate(rows):
+        matrix[i] = row[:ROW_SIZE]
+    return matrix
+
+
+def _parse_json(body):
+    try:
+        return orjson.loads(body) if orjson else json.loads(body)
+    except ValueError:
+        raise BinanceRequestException(f"Invalid Response: {body[:200].decode(errors='replace')}")
+
+
+def decode_klines(payload):
+    """تحويل رد /klines (bytes أو نص أو قائمة) إلى KlineArrays
+    رد خطأ من Binance ({"code": ..., "msg": ...}) يرفع BinanceAPIException كما في get_klines"""
+    if isinstance(payload, str):
+        payload = payload.encode()
+
+    if isinstance(payload, (bytes, bytearray)):
+        body = bytes(payload).strip()
+        matrix = None
+        # المسار السريع (مصفوفة صفوف فقط): حذف الأقواس وعلامات الاقتباس ثم تحليل الأرقام
+        # مباشرة من البايتات دون إنشاء كائنات بايثون لكل قيمة
+        if body.startswith(b'[['):
+            try:
+                flat = np.fromstring(body.translate(None, b'[]"'), dtype=np.float64, sep=',')
+            except ValueError:
+                flat = None
+            # NumPy 1.x لا يرفع خطأ عند قيمة غير رقمية بل يتوقف ويعيد جزءاً من القيم (مع تحذير)،
+            # لذلك يجب أن يطابق العدد عدد الصفوف الفعلي في الرد
+            rows = body.count(b'],[') + 1
+            if flat is not None and flat.size == rows * ROW_SIZE:
+                matrix = flat.reshape(rows, ROW_SIZE)
+        if matrix is None:
+            rows = _parse_json(body)
+            if isinstance(rows, dict):
+                raise BinanceAPIException(None, 200, body.decode(errors='replace'))
+            matrix = _from_rows(rows)
+    else:
+        matrix = _from_rows(payload)
+
+    # استبعاد الصفوف غير الصالحة (بديل dropna)
+    valid = np.isfinite(matrix[:, 1:6]).all(axis=1)
+    if not valid.all():
+        matrix = matrix[valid]
+    return KlineArrays(matrix)
+
+
+def fetch_raw_klines(client, symbol, interval, limit):
+    """جلب الرد الخام كبايتات من جلسة العميل، مع الرجوع إلى get_klines عند التعذر"""
+    try:
+        uri = client._create_api_uri('klines', False, client.PUBLIC_API_VERSION)
+        response = client.session.get(
+            uri, params={'symbol': symbol, 'interval': interval, 'limit': limit},
+            timeout=getattr(client, 'REQUEST_TIMEOUT', 10)
+        )
+        # نفس معالجة أخطاء _handle_response في العميل (الرد الخام لا يمر بها)
+        if not 200 <= response.status_code < 300:
+            raise BinanceAPIException(response, response.status_code, response.text)
+        return response.content
+    except AttributeError:
+        return client.get_klines(symbol=symbol, interval=interval, limit=limit)
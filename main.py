@@ -1,16 +1,53 @@
-from flask import Flask, render_template, request, jsonify
-from hybrid_bot_engine import AIONHybridBot
+from flask import Flask, render_template, request, jsonify, g, abort
+from bot_pool import BotPool
+from scan_cluster import SignalQueue
+from structured_log import setup_logging
+import hmac
+import math
 import os
+import sys
+import atexit
+import concurrent.futures
+import signal
 from dotenv import load_dotenv
 from datetime import datetime
+from urllib.parse import quote
 
 load_dotenv()
 
+# 📝 سجلات مهيكلة غير حاجبة (LOG_LEVEL / LOG_LEVELS / LOG_FILE)
+setup_logging()
+
 app = Flask(__name__)
-bot = AIONHybridBot()
+
+# 👥 عدة حسابات/استراتيجيات في عملية واحدة تتشارك بيانات السوق
+# 🌐 SCAN_QUEUE=cluster/signals.db: المسح يتم في عمليات scan_worker.py وهذه العملية تنفذ وتحفظ فقط
+pool = BotPool(base_dir=os.getenv('ACCOUNTS_DIR', 'accounts'), scan_queue=os.getenv('SCAN_QUEUE'))
+bot = pool.create(BotPool.DEFAULT)
+for account_name in filter(None, os.getenv('BOT_ACCOUNTS', '').split(',')):
+    pool.create(account_name.strip())
+
+# 💾 إيقاف العمال وحفظ الحالة عند الخروج
+atexit.register(pool.shutdown)
+
+@app.url_value_preprocessor
+def pull_account(endpoint, values):
+    """استخراج اسم الحساب من المسار /accounts/<account>/..."""
+    account = (values or {}).pop('account', None)
+    g.account = account or BotPool.DEFAULT
+    # بادئة الروابط للوحة: نفس المسار الذي فُتحت منه (مع جذر التطبيق خلف وكيل)
+    g.api_base = request.script_root + (f"/accounts/{quote(account, safe='')}" if account else "")
+
+def current_bot():
+    """المحرك الخاص بالحساب المطلوب"""
+    account_bot = pool.get(getattr(g, 'account', BotPool.DEFAULT))
+    if account_bot is None:
+        abort(404)
+    return account_bot
 
 @app.route('/')
 def dashboard():
+    bot = current_bot()
     stats = bot.get_performance_stats()
     trades = bot.get_recent_trades()
     progress = bot.get_progress_data()
@@ -27,11 +64,13 @@ def dashboard():
         balance=bot.balance,
         connection_status=connection_status,
         has_keys=has_keys,
-        saved_api_key=bot.api_key[:8] + "..." if bot.api_key else None
+        saved_api_key=bot.api_key[:8] + "..." if bot.api_key else None,
+        api_base=g.api_base
     )
 
 @app.route('/start', methods=['POST'])
 def start_bot():
+    bot = current_bot()
     data = request.json
     api_key = data.get('api_key', '').strip()
     api_secret = data.get('api_secret', '').strip()
@@ -61,11 +100,13 @@ def start_bot():
 
 @app.route('/stop', methods=['POST'])
 def stop_bot():
+    bot = current_bot()
     result = bot.stop_trading()
     return jsonify({"status": result})
 
 @app.route('/simulate', methods=['POST'])
 def simulate():
+    bot = current_bot()
     data = request.json
     start_date = data.get('start_date', '2024-01-01')
     end_date = data.get('end_date', '2024-01-31')
@@ -75,110 +116,103 @@ def simulate():
 
 @app.route('/stats')
 def get_stats():
+    bot = current_bot()
     return jsonify(bot.get_performance_stats())
 
 @app.route('/progress')
 def get_progress():
+    bot = current_bot()
     return jsonify(bot.get_progress_data())
 
 @app.route('/trades')
 def get_trades():
+    bot = current_bot()
     return jsonify(bot.get_recent_trades())
 
 @app.route('/live-trades')
 def get_live_trades():
+    bot = current_bot()
     return jsonify(bot.get_live_trades())
 
 @app.route('/balance-history')
 def get_balance_history():
-    return jsonify(bot.get_balance_history())
+    bot = current_bot()
+    # ?start=...&end=...&resolution=raw|minute|hour|day&points=500
+    try:
+        start = parse_time_arg('start')
+        end = parse_time_arg('end')
+        points = request.args.get('points')
+        points = int(points) if points is not None else None
+    except ValueError as e:
+        return jsonify({"error": f"❌ معاملات غير صالحة: {e}"}), 400
+    if points is not None and points <= 0:
+        return jsonify({"error": "❌ points يجب أن يكون أكبر من صفر"}), 400
+    if start is not None and end is not None and start > end:
+        return jsonify({"error": "❌ start بعد end"}), 400
+    resolution = request.args.get('resolution')
+    return jsonify(bot.get_balance_history(start, end, resolution, points))
+
+def parse_time_arg(name):
+    """وقت من معاملات الطلب (ISO أو ثوانٍ منذ 1970) - ValueError إذا تعذر فهمه"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        epoch = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '')).timestamp()
+    if not math.isfinite(epoch):
+        raise ValueError(f"invalid time {value!r}")
+    return epoch
 
 @app.route('/intelligence')
 def get_intelligence():
+    bot = current_bot()
     stats = bot.get_performance_stats()
     return jsonify(stats['adaptive_intelligence'])
 
 @app.route('/test-api-keys', methods=['POST'])
 def test_api_keys():
-    """اختبار مفصل للمفاتيح"""
-    try:
-        data = request.json
-        api_key = data.get('api_key', '').strip()
-        api_secret = data.get('api_secret', '').strip()
-        mode = data.get('mode', 'DEMO')
-        
-        # إذا كانت المفاتيح محفوظة مسبقاً
-        if not api_key and bot.api_key:
-            api_key = bot.api_key
-        if not api_secret and bot.api_secret:
-            api_secret = bot.api_secret
-        
-        if not api_key or not api_secret:
-            return jsonify({
-                "success": False,
-                "message": "❌ يرجى إدخال كلا المفتاحين",
-                "details": "المفاتيح لا يمكن أن تكون فارغة"
-            })
-        
-        # اختبار الاتصال الفعلي
-        from binance.client import Client
-        client = Client(api_key, api_secret, testnet=(mode=='DEMO'))
-        
-        # اختبار جلب أسعار حقيقية متعددة
-        symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT"]
-        prices = {}
-        
-        for symbol in symbols:
-            try:
-                ticker = client.get_symbol_ticker(symbol=symbol)
-                prices[symbol] = float(ticker['price'])
-            except:
-                prices[symbol] = "غير متاح"
-        
-        # اختبار الحساب
-        account_info = client.get_account()
-        
+    """اختبار مفصل للمفاتيح (غير حاجب - النتيجة تُخزن مؤقتاً)"""
+    bot = current_bot()
+    data = request.json
+    api_key = data.get('api_key', '').strip()
+    api_secret = data.get('api_secret', '').strip()
+    mode = data.get('mode', 'DEMO')
+    
+    # إذا كانت المفاتيح محفوظة مسبقاً
+    if not api_key and bot.api_key:
+        api_key = bot.api_key
+    if not api_secret and bot.api_secret:
+        api_secret = bot.api_secret
+    
+    if not api_key or not api_secret:
         return jsonify({
-            "success": True,
-            "message": f"✅ المفاتيح صحيحة - اتصال ناجح بـ {len([p for p in prices.values() if isinstance(p, float)])}/5 عملات",
-            "details": {
-                "can_trade": account_info.get('canTrade', False),
-                "account_type": "Testnet" if mode == "DEMO" else "Real",
-                "balances_count": len(account_info.get('balances', [])),
-                "prices": prices,
-                "server_time": client.get_server_time()['serverTime']
-            }
+            "success": False,
+            "message": "❌ يرجى إدخال كلا المفتاحين",
+            "details": "المفاتيح لا يمكن أن تكون فارغة"
         })
-        
-    except Exception as e:
-        error_msg = str(e)
-        details = "خطأ غير معروف"
-        
-        if "Invalid API-key" in error_msg:
-            details = "مفتاح API غير صحيح - تأكد من نسخه من testnet.binance.vision"
-        elif "Signature" in error_msg:
-            details = "مفتاح Secret غير صحيح - تأكد من نسخه بشكل كامل"
-        elif "restrictions" in error_msg.lower():
-            details = "قيود جغرافية - قد تحتاج VPN"
-        elif "connection" in error_msg.lower():
-            details = "مشكلة في الاتصال - تحقق من الإنترنت"
-        
+    
+    # الاختبار يعمل في الخلفية - الطلب ينتظر قليلاً فقط ثم يعيد "قيد التحقق"
+    future = bot.validator.validate(api_key, api_secret, mode)
+    try:
+        result = future.result(timeout=float(os.getenv('KEY_TEST_WAIT', 2)))
+    except concurrent.futures.TimeoutError:
         return jsonify({
             "success": False,
-            "message": "❌ فشل في الاتصال",
-            "details": details,
-            "error": error_msg
-        })
+            "pending": True,
+            "message": "🔍 جاري اختبار المفاتيح...",
+            "details": "أعد المحاولة بعد لحظات"
+        }), 202
+    
+    return jsonify(bot.validator.public(result))
 
 @app.route('/clear-keys', methods=['POST'])
 def clear_keys():
     """مسح المفاتيح المحفوظة"""
+    bot = current_bot()
     try:
-        if os.path.exists(bot.keys_file):
-            os.remove(bot.keys_file)
-        bot.api_key = None
-        bot.api_secret = None
-        bot.client = None
+        bot.clear_keys()
         return jsonify({"status": "✅ تم مسح المفاتيح"})
     except Exception as e:
         return jsonify({"error": f"❌ خطأ في مسح المفاتيح: {e}"})
@@ -186,12 +220,68 @@ def clear_keys():
 @app.route('/get-saved-keys', methods=['GET'])
 def get_saved_keys():
     """الحصول على حالة المفاتيح المحفوظة"""
+    bot = current_bot()
     return jsonify({
         "has_saved_keys": bot.api_key is not None,
         "keys_preview": bot.api_key[:8] + "..." if bot.api_key else None,
         "mode": bot.mode
     })
 
+@app.route('/settings')
+def get_settings():
+    """الإعدادات الحالية (تُعاد قراءتها من الملف/.env عند التغيير)"""
+    pool.settings.maybe_reload()
+    return jsonify(pool.settings.snapshot())
+
+@app.route('/accounts', methods=['GET'])
+def list_accounts():
+    """قائمة الحسابات العاملة"""
+    return jsonify(pool.summary())
+
+@app.route('/accounts', methods=['POST'])
+def create_account():
+    """إضافة حساب جديد بمساحة حالة مستقلة"""
+    name = (request.json or {}).get('name', '').strip()
+    if not name or not name.replace('-', '').replace('_', '').isalnum():
+        return jsonify({"error": "❌ اسم الحساب غير صالح"}), 400
+    pool.create(name)
+    return jsonify({"status": f"✅ تم إنشاء الحساب {name}", "accounts": pool.names()})
+
+@app.route('/accounts/<name>', methods=['DELETE'])
+def remove_account(name):
+    """إيقاف وإزالة حساب"""
+    if name == BotPool.DEFAULT or not pool.remove(name):
+        return jsonify({"error": "❌ لا يمكن إزالة هذا الحساب"}), 400
+    return jsonify({"status": f"🛑 تمت إزالة الحساب {name}"})
+
+@app.route('/cluster/<op>', methods=['POST'])
+def cluster_rpc(op):
+    """طابور المسح عبر الشبكة لعمال scan_worker.py على أجهزة أخرى (--queue http://...)"""
+    if pool.cluster_feed is None or op not in SignalQueue.REMOTE_OPS:
+        abort(404)
+    token = os.getenv('SCAN_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('X-Scan-Token', ''), token):
+        abort(403)
+    try:
+        result = getattr(pool.cluster_feed.queue, op)(**(request.get_json(silent=True) or {}))
+    except TypeError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"result": result})
+
+# 🔀 كل مسارات الحساب متاحة أيضاً تحت /accounts/<account>/...
+for rule in list(app.url_map.iter_rules()):
+    if rule.endpoint in ('static', 'get_settings', 'list_accounts', 'create_account', 'remove_account', 'cluster_rpc'):
+        continue
+    app.add_url_rule(
+        '/accounts/<account>' + rule.rule,
+        endpoint=rule.endpoint,
+        methods=rule.methods - {'HEAD', 'OPTIONS'}
+    )
+
 if __name__ == '__main__':
+    # SIGTERM (إعادة التشغيل/النشر) يمر عبر atexit مثل Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # بدون إعادة التحميل التلقائي: المُعيد يشغل الوحدة في عمليتين، فتنشئ العملية الأم محركات
+    # خاملة بحالة الإقلاع تحفظها عند الخروج فوق حالة العملية التي تتداول فعلاً
+    app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from indicators import LazyIndicators
+from features import build_features
+from kline_decoder import decode_klines, fetch_raw_klines
+from structured_log import get_logger, log_event
+
+logger = get_logger("market_data")
+
+
+class MarketDataHub:
+    """طبقة بيانات سوق مشتركة - جلب واحد ومؤشرات محسوبة مرة واحدة لكل المحركات"""
+
+    def __init__(self, client_provider, kline_ttl=15, price_ttl=5, max_limit=100, depth_ttl=10, depth_limit=20):
+        # client_provider: دالة تعيد عميل Binance صالح (أو None)
+        self.client_provider = client_provider
+        self.kline_ttl = kline_ttl
+        self.price_ttl = price_ttl
+        self.max_limit = max_limit
+        self.depth_ttl = depth_ttl
+        self.depth_limit = depth_limit
+
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.klines = {}
+        self.frames = {}
+        self.prices = {}
+        self.depth = {}
+        self.stats = {"fetches": 0, "hits": 0}
+
+    def _key_lock(self, key):
+        """قفل لكل مفتاح - طلب واحد فقط في نفس الوقت لنفس البيانات"""
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _client(self):
+        client = self.client_provider()
+        if client is None:
+            raise RuntimeError("no market data client available")
+        return client
+
+    def _fetch_klines(self, symbol, interval, limit):
+        key = (symbol, interval)
+        with self._key_lock(('klines',) + key):
+            cached = self.klines.get(key)
+            if cached and time.time() - cached[0] < self.kline_ttl and cached[2] >= limit:
+                self.stats["hits"] += 1
+                return cached[1]
+
+            fetch_limit = max(limit, self.max_limit)
+            # الرد الخام يُحلل مباشرة إلى أعمدة NumPy مُنمّطة
+            klines = decode_klines(fetch_raw_klines(self._client(), symbol, interval, fetch_limit))
+            self.stats["fetches"] += 1
+            self.klines[key] = (time.time(), klines, fetch_limit)
+            return klines
+
+    def _frame_entry(self, symbol, interval, limit):
+        """مدخل الإطار المخزن: الشموع الرقمية + المؤشرات + الميزات المحسوبة
+
+        الجلب مشترك (بحد max_limit على الأقل)، أما المؤشرات فتُحسب على آخر limit شمعة فقط -
+        لكل حد إطار خاص حتى لا تختلط ميزات advanced_kline_limit و quick_kline_limit"""
+        klines = self._fetch_klines(symbol, interval, limit)
+        key = (symbol, interval, limit)
+        with self._key_lock(('frame',) + key):
+            entry = self.frames.get(key)
+            if entry is None or entry["klines"] is not klines:
+                df = klines.tail(limit).to_frame()
+                # المؤشرات تُحسب عند الطلب فقط (انظر indicators.LazyIndicators)
+                indicators = LazyIndicators(df) if len(df) >= 20 else None
+                entry = {"klines": klines, "df": df, "indicators": indicators, "features": {}}
+                self.frames[key] = entry
+        return entry
+
+    def get_features(self, symbol, interval, names, limit=100):
+        """متجه الميزات المطلوبة - كل ميزة تُحسب مرة واحدة لكل دفعة شموع"""
+        entry = self._frame_entry(symbol, interval, limit)
+        if entry["indicators"] is None:
+            return None
+        with self._key_lock(('frame', symbol, interval, limit)):
+            try:
+                build_features(entry["df"], entry["indicators"], names, entry["features"])
+            except Exception as e:
+                log_event(logger, logging.WARNING, f"Indicators calculation error: {e}", sample=0.1,
+                          symbol=symbol, interval=interval, error_class=type(e).__name__)
+                return None
+            return dict(entry["features"])
+
+    def latest_closes(self, interval):
+        """آخر شمعة مغلقة لكل عملة مخزنة: (وقت الفتح، {العملة: سعر الإغلاق})"""
+        closes = {}
+        for (symbol, cached_interval), (_, klines, _) in list(self.klines.items()):
+            if cached_interval == interval and len(klines) >= 2:
+                closes[symbol] = (int(klines.open_time[-2]), float(klines.close[-2]))
+        if not closes:
+            return None, {}
+        stamp = max(open_time for open_time, _ in closes.values())
+        return stamp, {symbol: close for symbol, (open_time, close) in closes.items() if open_time == stamp}
+
+    def get_price(self, symbol):
+        """السعر الحالي مع تخزين مؤقت قصير"""
+        with self._key_lock(('price', symbol)):
+            cached = self.prices.get(symbol)
+            if cached and time.time() - cached[0] < self.price_ttl:
+                self.stats["hits"] += 1
+                return cached[1]
+            ticker = self._client().get_symbol_ticker(symbol=symbol)
+            price = float(ticker['price'])
+            self.stats["fetches"] += 1
+            self.prices[symbol] = (time.time(), price)
+            return price
+
+    def latest_prices(self, symbols):
+        """أحدث سعر معروف لكل عملة من الذاكرة فقط (سعر التيكر أو آخر إغلاق شمعة) - بدون طلبات شبكة"""
+        wanted = set(symbols)
+        latest = {}
+        for (symbol, _), (fetched, klines, _) in list(self.klines.items()):
+            if symbol in wanted and len(klines) and fetched > latest.get(symbol, (0, 0))[0]:
+                latest[symbol] = (fetched, float(klines.close[-1]))
+        for symbol, (fetched, price) in list(self.prices.items()):
+            if symbol in wanted and fetched >= latest.get(symbol, (0, 0))[0]:
+                latest[symbol] = (fetched, price)
+        return {symbol: price for symbol, (_, price) in latest.items()}
+
+    def get_depth(self, symbol):
+        """لقطة أفضل مستويات دفتر الأوامر مع تخزين مؤقت: {"bids": [(سعر، كمية)], "asks": [...]}"""
+        with self._key_lock(('depth', symbol)):
+            cached = self.depth.get(symbol)
+            if cached and time.time() - cached[0] < self.depth_ttl:
+                self.stats["hits"] += 1
+                return cached[1]
+            book = self._client().get_order_book(symbol=symbol, limit=self.depth_limit)
+            snapshot = {
+                side: [(float(price), float(size)) for price, size in book[side]]
+                for side in ("bids", "asks")
+            }
+            self.stats["fetches"] += 1
+            self.depth[symbol] = (time.time(), snapshot)
+            return snapshot
+
+    def cached_depth(self, symbol):
+        """آخر لقطة دفتر مخزنة (حتى لو قديمة) أو None"""
+        cached = self.depth.get(symbol)
+        return cached[1] if cached else None
@@ -0,0 +1,267 @@
+import threading
+import time
+import numpy as np
+from trade_ledger import StringTable
+
+
+def fill_price(depth, quantity, side, fallback_bps=5.0):
+    """سعر التنفيذ المتوسط لأمر سوق بالمشي على مستويات الدفتر
+
+    depth: {"bids": [(السعر، الكمية)], "asks": [...]} من أفضل مستوى
+    side: +1 شراء (يأخذ asks)، -1 بيع (يأخذ bids). يعيد (السعر، الانزلاق بالنسبة لمنتصف السعر)
+    """
+    if not depth or not depth.get("bids") or not depth.get("asks"):
+        return None, side * fallback_bps / 10000
+
+    levels = depth["asks"] if side > 0 else depth["bids"]
+    mid = (depth["bids"][0][0] + depth["asks"][0][0]) / 2
+    remaining = quantity
+    cost = 0.0
+    for price, size in levels:
+        take = min(remaining, size)
+        cost += take * price
+        remaining -= take
+        if remaining <= 0:
+            break
+    if remaining > 0:
+        # الكمية أكبر من عمق اللقطة: الباقي بعد آخر مستوى مع عقوبة إضافية
+        last = levels[-1][0]
+        cost += remaining * last * (1 + side * fallback_bps / 10000)
+
+    average = cost / quantity
+    return average, average / mid - 1
+
+
+class PaperBook:
+    """دفتر مراكز افتراضية بأعمدة NumPy - تقييم كل المراكز المفتوحة بعملية متجهة واحدة"""
+
+    def __init__(self, capacity=1024):
+        self.lock = threading.Lock()
+        self.symbols = StringTable()
+        self.size = 0
+        self.free = []
+        self.meta = {}
+
+        self.symbol = np.zeros(capacity, dtype=np.int32)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.entry = np.zeros(capacity)
+        self.quantity = np.zeros(capacity)
+        self.stop = np.zeros(capacity)
+        self.target = np.zeros(capacity)
+        self.expires = np.zeros(capacity)
+        self.mark = np.full(capacity, np.nan)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    COLUMNS = ("symbol", "side", "entry", "quantity", "stop", "target", "expires", "mark", "active")
+
+    def _grow(self):
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(len(column) * 2, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def open(self, trade, stop, target, expires):
+        """فتح مركز: trade قاموس الصفقة (يحمل symbol/action/entry_price/quantity)"""
+        with self.lock:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                if self.size >= len(self.active):
+                    self._grow()
+                slot = self.size
+                self.size += 1
+
+            self.symbol[slot] = self.symbols.intern(trade["symbol"])
+            self.side[slot] = 1 if trade["action"] == "BUY" else -1
+            self.entry[slot] = trade["entry_price"]
+            self.quantity[slot] = trade["quantity"]
+            self.stop[slot] = stop
+            self.target[slot] = target
+            self.expires[slot] = expires
+            self.mark[slot] = trade["entry_price"]
+            self.active[slot] = True
+            self.meta[slot] = trade
+            return slot
+
+    def open_count(self):
+        return len(self.meta)
+
+    def open_symbols(self):
+        with self.lock:
+            codes = np.unique(self.symbol[:self.size][self.active[:self.size]])
+            return [self.symbols[code] for code in codes]
+
+    def mark_to_market(self, prices, now=None):
+        """تحديث كل المراكز بأسعار {العملة: السعر} وإعادة المراكز الواجب إغلاقها
+
+        يعيد [(الموضع، سعر التقييم، السبب)] - الإغلاق الفعلي يتم عبر close()
+        """
+        now = now or time.time()
+        with self.lock:
+            n = self.size
+            if not self.meta:
+                return []
+
+            # جدول سعر لكل رمز عملة ثم التقاط السعر لكل مركز دفعة واحدة
+            table = np.full(len(self.symbols.values), np.nan)
+            for symbol, price in prices.items():
+                code = self.symbols.codes.get(symbol)
+                if code is not None:
+                    table[code] = price
+            current = table[self.symbol[:n]]
+            fresh = self.active[:n] & ~np.isnan(current)
+            self.mark[:n] = np.where(fresh, current, self.mark[:n])
+
+            mark = self.mark[:n]
+            long = self.side[:n] > 0
+            stopped = np.where(long, mark <= self.stop[:n], mark >= self.stop[:n]) & fresh
+            reached = np.where(long, mark >= self.target[:n], mark <= self.target[:n]) & fresh & ~stopped
+            expired = (self.expires[:n] <= now) & self.active[:n] & ~stopped & ~reached
+
+            exits = []
+            for reason, mask in (("stop", stopped), ("target", reached), ("time", expired)):
+                for slot in np.flatnonzero(mask):
+                    exits.append((int(slot), float(mark[slot]), reason))
+            return exits
+
+    def close(self, slot):
+        """تحرير المركز وإعادة قاموس صفقته"""
+        with self.lock:
+            trade = self.meta.pop(slot, None)
+            if trade is not None:
+                self.active[slot] = False
+                self.free.append(slot)
+            return trade
+
+    def unrealized(self):
+        """الربح غير المحقق لكل المراكز المفتوحة (متجه)"""
+        with self.lock:
+            n = self.size
+            pnl = (self.mark[:n] - self.entry[:n]) * self.quantity[:n] * self.side[:n]
+            return float(pnl[self.active[:n]].sum())
+
+    def positions(self, limit=None):
+        """المراكز المفتوحة كقواميس للعرض (الأحدث أولاً)"""
+        with self.lock:
+            slots = sorted(self.meta, key=lambda slot: self.meta[slot]["entry_time"], reverse=True)[:limit]
+            result = []
+            for slot in slots:
+                trade = dict(self.meta[slot])
+                mark = float(self.mark[slot])
+                profit = (mark - self.entry[slot]) * self.quantity[slot] * self.side[slot]
+                trade.update({
+                    "exit_price": round(mark, 6),
+                    "price_change": round((mark / self.entry[slot] - 1) * 100, 3),
+                    "profit": round(float(profit), 4),
+                    "profit_percentage": round(float(profit) / trade["amount"] * 100, 2) if trade["amount"] else 0.0,
+                    "stop_price": round(float(self.stop[slot]), 6),
+                    "target_price": round(float(self.target[slot]), 6),
+                    "expires_at": float(self.expires[slot])
+                })
+                result.append(trade)
+            return result
+
+    def to_list(self):
+        """للحفظ في ملف الحالة"""
+        with self.lock:
+            return [
+                dict(self.meta[slot], stop_price=float(self.stop[slot]), target_price=float(self.target[slot]),
+                     expires_at=float(self.expires[slot]))
+                for slot in self.meta
+            ]
+
+    def restore(self, positions):
+        for trade in positions:
+            trade = dict(trade)
+            self.open(trade, trade.pop("stop_price"), trade.pop("target_price"), trade.pop("expires_at"))
+
+
+class PaperTrader:
+    """محاكي تنفيذ للوضع التجريبي: دخول بسعر الإشارة + انزلاق من عمق الدفتر، وخروج بالوقف/الهدف/الوقت"""
+
+    def __init__(self, market_data, hold_seconds=1800, stop_atr=1.5, reward_ratio=2.0,
+                 min_stop=0.005, max_stop=0.015, fee_rate=0.001, fallback_slippage_bps=5.0):
+        self.market_data = market_data
+        self.hold_seconds = hold_seconds
+        self.stop_atr = stop_atr
+        self.reward_ratio = reward_ratio
+        self.min_stop = min_stop
+        self.max_stop = max_stop
+        self.fee_rate = fee_rate
+        self.fallback_slippage_bps = fallback_slippage_bps
+        self.book = PaperBook()
+        self.stats = {"opened": 0, "closed": 0, "stop": 0, "target": 0, "time": 0}
+
+    def _slippage(self, symbol, quantity, side, fetch):
+        """الانزلاق النسبي من لقطة أفضل مستويات الدفتر (مخزنة مؤقتاً)"""
+        depth = self.market_data.get_depth(symbol) if fetch else self.market_data.cached_depth(symbol)
+        _, slippage = fill_price(depth, quantity, side, self.fallback_slippage_bps)
+        return slippage
+
+    def stop_distance(self, signal):
+        """مسافة الوقف من ATR الإشارة (نسبة) ضمن حدود ثابتة"""
+        atr_pct = signal.get("atr_pct")
+        if atr_pct is None or not np.isfinite(atr_pct):
+            return self.max_stop
+        return float(np.clip(self.stop_atr * atr_pct / 100, self.min_stop, self.max_stop))
+
+    def open(self, trade, signal):
+        """فتح مركز افتراضي - يعدل سعر الدخول بالانزلاق ويعيد الصفقة المفتوحة"""
+        side = 1 if trade["action"] == "BUY" else -1
+        try:
+            slippage = self._slippage(trade["symbol"], trade["quantity"], side, fetch=True)
+        except Exception:
+            slippage = side * self.fallback_slippage_bps / 10000
+
+        entry = trade["entry_price"] * (1 + slippage)
+        distance = self.stop_distance(signal)
+        trade.update({
+            "entry_price": round(entry, 6),
+            "quantity": round(trade["amount"] / entry, 8),
+            "slippage_bps": round(abs(slippage) * 10000, 2),
+            "status": "OPEN"
+        })
+        stop = entry * (1 - side * distance)
+        target = entry * (1 + side * distance * self.reward_ratio)
+        self.book.open(trade, stop, target, time.time() + self.hold_seconds)
+        self.stats["opened"] += 1
+        return trade
+
+    def latest_prices(self):
+        """أحدث الأسعار من ذاكرة بيانات السوق فقط - بدون طلبات شبكة"""
+        return self.market_data.latest_prices(self.book.open_symbols())
+
+    def step(self, now=None):
+        """دورة تقييم واحدة - يعيد الصفقات المغلقة (قواميس كاملة)"""
+        closed = []
+        for slot, mark, reason in self.book.mark_to_market(self.latest_prices(), now):
+            trade = self.book.close(slot)
+            if trade is None:
+                continue
+            side = 1 if trade["action"] == "BUY" else -1
+            slippage = self._slippage(trade["symbol"], trade["quantity"], -side, fetch=False)
+            exit_price = mark * (1 + slippage)
+
+            gross = (exit_price - trade["entry_price"]) * trade["quantity"] * side
+            fees = (trade["entry_price"] + exit_price) * trade["quantity"] * self.fee_rate
+            profit = gross - fees
+            trade.update({
+                "exit_price": round(exit_price, 6),
+                "exit_reason": reason,
+                "exit_time": time.time() if now is None else now,
+                "profit": round(profit, 4),
+                "profit_percentage": round(profit / trade["amount"] * 100, 2),
+                "status": "CLOSED"
+            })
+            self.stats["closed"] += 1
+            self.stats[reason] += 1
+            closed.append(trade)
+        return closed
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "open_positions": self.book.open_count(),
+            "unrealized_profit": round(self.book.unrealized(), 4)
+        }
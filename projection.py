@@ -0,0 +1,141 @@
+import threading
+import time
+import numpy as np
+
+
+class MonteCarloProjector:
+    """إسقاط مونت كارلو نحو الهدف بإعادة معاينة عوائد صفقات البوت نفسه"""
+
+    PERCENTILES = (5, 25, 50, 75, 95)
+
+    def __init__(self, paths=20000, min_trades=10, refresh_interval=30, drawdown_limit=0.20,
+                 max_exact_trades_per_day=64, seed=None):
+        self.paths = paths
+        self.min_trades = min_trades
+        self.refresh_interval = refresh_interval
+        self.drawdown_limit = drawdown_limit
+        self.max_exact_trades_per_day = max_exact_trades_per_day
+        self.rng = np.random.default_rng(seed)
+
+        self.lock = threading.Lock()
+        self.result = None
+        self.version = -1
+        self.computed_at = 0.0
+        self.worker = None
+
+    def snapshot(self):
+        """آخر نتيجة محسوبة (لا تحجب أبداً)"""
+        with self.lock:
+            if self.result is None:
+                return {"status": "pending"}
+            return dict(self.result, age_seconds=round(time.time() - self.computed_at, 1))
+
+    def request_refresh(self, ledger, balance, target, days_remaining):
+        """تحديث في الخلفية عند وصول صفقات جديدة (بحد أقصى مرة كل refresh_interval)"""
+        with self.lock:
+            version = len(ledger)
+            if self.worker is not None and self.worker.is_alive():
+                return False
+            if version == self.version and time.time() - self.computed_at < self.refresh_interval * 10:
+                return False
+            if time.time() - self.computed_at < self.refresh_interval and self.result is not None:
+                return False
+
+            # نسخ الأعمدة المطلوبة فقط - المحاكاة تعمل على نسخة ثابتة
+            # تحت قفل السجل: صفقة تُضاف بين النسخ تجعل الأعمدة بأطوال مختلفة
+            with ledger.lock:
+                profits = ledger.column("profit").copy()
+                before = ledger.column("balance_before").copy()
+                times = ledger.column("record_time").copy()
+            self.worker = threading.Thread(
+                target=self._run,
+                args=(version, profits, before, times, balance, target, days_remaining),
+                daemon=True
+            )
+            self.worker.start()
+            return True
+
+    def _run(self, version, profits, before, times, balance, target, days_remaining):
+        try:
+            result = self.project(profits, before, times, balance, target, days_remaining)
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        with self.lock:
+            self.result = result
+            self.version = version
+            self.computed_at = time.time()
+
+    @staticmethod
+    def trade_returns(profits, balances_before):
+        """عائد كل صفقة كنسبة من الرصيد (لوغاريتمي)"""
+        valid = balances_before > 0
+        returns = profits[valid] / balances_before[valid]
+        return np.log1p(np.clip(returns, -0.99, None))
+
+    @staticmethod
+    def trades_per_day(times, now=None, window_days=7):
+        """معدل الصفقات اليومي من آخر أسبوع"""
+        if not len(times):
+            return 0.0
+        now = now or time.time()
+        start = max(now - window_days * 86400, times[0])
+        count = int(np.count_nonzero(times >= start))
+        return count / max((now - start) / 86400, 1.0)
+
+    def project(self, profits, balances_before, times, balance, target, days_remaining):
+        """المحاكاة المتجهة: paths × days"""
+        returns = self.trade_returns(profits, balances_before)
+        rate = self.trades_per_day(times)
+        if len(returns) < self.min_trades or rate <= 0 or days_remaining <= 0:
+            return {"status": "insufficient_data", "sample_trades": int(len(returns))}
+
+        paths = self.paths
+        log_equity = np.full(paths, np.log(balance))
+        peak = log_equity.copy()
+        max_drawdown = np.zeros(paths)
+        hit_day = np.full(paths, -1)
+        log_target = np.log(target)
+        bands = []
+
+        exact = rate <= self.max_exact_trades_per_day
+        mean, std = returns.mean(), returns.std()
+
+        for day in range(days_remaining):
+            if exact:
+                # عدد صفقات بواسون لكل مسار، وإعادة معاينة العوائد الفعلية
+                counts = self.rng.poisson(rate, paths)
+                width = max(int(counts.max()), 1)
+                samples = returns[self.rng.integers(0, len(returns), (paths, width))]
+                samples *= np.arange(width) < counts[:, None]
+                daily = samples.sum(axis=1)
+            else:
+                # معدل مرتفع: تقريب المجموع اليومي بتوزيع طبيعي (نظرية النهاية المركزية)
+                daily = self.rng.normal(rate * mean, np.sqrt(rate) * std, paths)
+
+            log_equity += daily
+            np.maximum(peak, log_equity, out=peak)
+            np.maximum(max_drawdown, 1 - np.exp(log_equity - peak), out=max_drawdown)
+            hit_day[(hit_day < 0) & (log_equity >= log_target)] = day + 1
+            bands.append(np.exp(np.percentile(log_equity, self.PERCENTILES)))
+
+        bands = np.array(bands)
+        hit = hit_day > 0
+        final = np.exp(log_equity)
+        return {
+            "status": "ok",
+            "paths": paths,
+            "sample_trades": int(len(returns)),
+            "trades_per_day": round(rate, 2),
+            "method": "bootstrap" if exact else "normal_approximation",
+            "probability_hit_target": round(float(hit.mean()) * 100, 2),
+            "median_days_to_target": int(np.median(hit_day[hit])) if hit.any() else None,
+            "final_balance_percentiles": {
+                f"p{p}": round(float(v), 2) for p, v in zip(self.PERCENTILES, np.percentile(final, self.PERCENTILES))
+            },
+            "bands": {
+                f"p{p}": [round(float(v), 2) for v in bands[:, i]] for i, p in enumerate(self.PERCENTILES)
+            },
+            "median_max_drawdown": round(float(np.median(max_drawdown)) * 100, 2),
+            "drawdown_risk": round(float((max_drawdown > self.drawdown_limit).mean()) * 100, 2),
+            "drawdown_limit": self.drawdown_limit * 100
+        }
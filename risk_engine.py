@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque, defaultdict
+import numpy as np
+
+
+class RollingCorrelation:
+    """مصفوفة ارتباط متدحرجة (EWMA) تُحدّث تدريجياً مع كل شمعة جديدة"""
+
+    def __init__(self, symbols, decay=0.97, threshold=0.7, min_observations=20):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.decay = decay
+        self.threshold = threshold
+        self.min_observations = min_observations
+
+        n = len(self.symbols)
+        self.mean = np.zeros(n)
+        self.cov = np.zeros((n, n))
+        self.last_prices = np.full(n, np.nan)
+        self.last_stamp = None
+        self.observations = 0
+        self.clusters = {symbol: symbol for symbol in self.symbols}
+
+    def observe(self, prices, stamp):
+        """تحديث بعوائد شمعة مغلقة جديدة: prices = {symbol: close}"""
+        if stamp == self.last_stamp:
+            return False
+        self.last_stamp = stamp
+
+        current = np.full(len(self.symbols), np.nan)
+        for symbol, price in prices.items():
+            if symbol in self.index and price > 0:
+                current[self.index[symbol]] = price
+
+        returns = np.log(current / self.last_prices)
+        self.last_prices = np.where(np.isnan(current), self.last_prices, current)
+
+        # العملات بدون بيانات تُعامل كعائد صفري في هذه الخطوة
+        returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+        if not returns.any():
+            return False
+
+        alpha = 1 - self.decay
+        delta = returns - self.mean
+        self.mean += alpha * delta
+        self.cov = self.decay * (self.cov + alpha * np.outer(delta, delta))
+        self.observations += 1
+
+        self._update_clusters()
+        return True
+
+    def matrix(self):
+        std = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.cov / np.outer(std, std)
+        return np.nan_to_num(corr)
+
+    def _update_clusters(self):
+        """تجميع العملات المترابطة (ارتباط > العتبة) - مرة واحدة لكل تحديث"""
+        if self.observations < self.min_observations:
+            return
+
+        parent = list(range(len(self.symbols)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        rows, cols = np.nonzero(np.triu(self.matrix() > self.threshold, k=1))
+        for i, j in zip(rows, cols):
+            parent[find(i)] = find(j)
+
+        self.clusters = {symbol: self.symbols[find(i)] for i, symbol in enumerate(self.symbols)}
+
+    def cluster(self, symbol):
+        return self.clusters.get(symbol, symbol)
+
+
+class RiskEngine:
+    """تعرض حي لكل عملة/استراتيجية/مجموعة مترابطة مع فحص ما قبل الصفقة بتكلفة O(1)"""
+
+    def __init__(self, symbols, holding_seconds=1800, max_symbol=0.10, max_cluster=0.20,
+                 max_total=0.40, strategy_budgets=None, default_strategy_budget=0.20):
+        self.correlation = RollingCorrelation(symbols)
+        self.holding_seconds = holding_seconds
+
+        # الحدود كنسبة من الرصيد
+        self.max_symbol = max_symbol
+        self.max_cluster = max_cluster
+        self.max_total = max_total
+        self.strategy_budgets = strategy_budgets or {}
+        self.default_strategy_budget = default_strategy_budget
+
+        self.lock = threading.Lock()
+        self.positions = deque()
+        self.by_symbol = defaultdict(float)
+        self.by_strategy = defaultdict(float)
+        self.by_cluster = defaultdict(float)
+        self.total = 0.0
+        self.rejections = defaultdict(int)
+
+    def _expire(self, now):
+        """إزالة المراكز المنتهية - كل مركز يُزال مرة واحدة (O(1) مُطفأة)"""
+        while self.positions and self.positions[0][0] <= now:
+            _, symbol, strategy, amount = self.positions.popleft()
+            self.by_symbol[symbol] -= amount
+            self.by_strategy[strategy] -= amount
+            # المجموعة الحالية للعملة - by_cluster يُعاد توزيعه كلما تغيرت المجموعات
+            self.by_cluster[self.correlation.cluster(symbol)] -= amount
+            self.total -= amount
+
+    def check(self, symbol, strategy, amount, balance, now=None):
+        """فحص ما قبل الصفقة - يعيد (مسموح، السبب)"""
+        now = now or time.time()
+        with self.lock:
+            self._expire(now)
+            cluster = self.correlation.cluster(symbol)
+            budget = self.strategy_budgets.get(strategy, self.default_strategy_budget)
+
+            checks = (
+                ("total", self.total, self.max_total),
+                ("symbol", self.by_symbol[symbol], self.max_symbol),
+                ("cluster", self.by_cluster[cluster], self.max_cluster),
+                ("strategy", self.by_strategy[strategy], budget),
+            )
+            for name, exposure, limit in checks:
+                if exposure + amount > balance * limit + 1e-9:
+                    self.rejections[name] += 1
+                    return False, f"{name} exposure limit ({limit * 100:.0f}%)"
+            return True, None
+
+    def add_position(self, symbol, strategy, amount, now=None):
+        """تسجيل تعرض صفقة جديدة لمدة الاحتفاظ"""
+        now = now or time.time()
+        with self.lock:
+            cluster = self.correlation.cluster(symbol)
+            self.positions.append((now + self.holding_seconds, symbol, strategy, amount))
+            self.by_symbol[symbol] += amount
+            self.by_strategy[strategy] += amount
+            self.by_cluster[cluster] += amount
+            self.total += amount
+
+    def observe_prices(self, prices, stamp):
+        """تحديث مصفوفة الارتباط من أسعار الإغلاق المخزنة"""
+        with self.lock:
+            clusters = self.correlation.clusters
+            updated = self.correlation.observe(prices, stamp)
+            if updated and self.correlation.clusters != clusters:
+                self._rebucket()
+            return updated
+
+    def _rebucket(self):
+        """إعادة بناء تعرض المجموعات من تعرض العملات بالمجموعات الحالية (جذر المجموعة يتغير مع كل إعادة بناء)"""
+        self.by_cluster = defaultdict(float)
+        for symbol, amount in self.by_symbol.items():
+            if amount > 1e-9:
+                self.by_cluster[self.correlation.cluster(symbol)] += amount
+
+    def snapshot(self):
+        with self.lock:
+            self._expire(time.time())
+            clusters = defaultdict(list)
+            for symbol, cluster in self.correlation.clusters.items():
+                clusters[cluster].append(symbol)
+            return {
+                "total_exposure": round(self.total, 2),
+                "open_positions": len(self.positions),
+                "by_symbol": {k: round(v, 2) for k, v in self.by_symbol.items() if v > 1e-9},
+                "by_strategy": {k: round(v, 2) for k, v in self.by_strategy.items() if v > 1e-9},
+                "by_cluster": {k: round(v, 2) for k, v in self.by_cluster.items() if v > 1e-9},
+                "correlated_clusters": [members for members in clusters.values() if len(members) > 1],
+                "correlation_observations": self.correlation.observations,
+                "rejections": dict(self.rejections)
+            }
@@ -0,0 +1,237 @@
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import requests
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """حلقة تجزئة متسقة - إضافة/إزالة عقدة تنقل فقط حصتها من العملات"""
+
+    def __init__(self, nodes, replicas=64):
+        self.nodes = sorted(set(nodes))
+        self.ring = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self.keys = [key for key, _ in self.ring]
+
+    def owner(self, symbol):
+        if not self.ring:
+            return None
+        index = bisect.bisect(self.keys, _hash(symbol)) % len(self.ring)
+        return self.ring[index][1]
+
+    def partition(self, symbols, node):
+        """العملات التي تملكها العقدة"""
+        return [symbol for symbol in symbols if self.owner(symbol) == node]
+
+
+class SignalQueue:
+    """طابور إشارات بين عمليات المسح والمنسق عبر SQLite (WAL)
+
+    الجداول: signals (الإشارات المنشورة)، nodes (نبض العمال)، config (قائمة العملات من المنسق)
+    WAL يتطلب ذاكرة مشتركة على نفس الجهاز - الملف لا يوضع على نظام ملفات شبكي،
+    والعمال على أجهزة أخرى يصلون عبر HttpSignalQueue إلى المنسق
+    """
+
+    # عمليات العامل المتاحة عبر الشبكة (/cluster/<op> في المنسق)
+    REMOTE_OPS = ("publish", "heartbeat", "touch", "leave", "live_nodes", "symbols")
+
+    def __init__(self, path, node_timeout=30):
+        self.path = path
+        self.node_timeout = node_timeout
+        self.stale = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS signals (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    node TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    payload TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS nodes (
+                    node TEXT PRIMARY KEY,
+                    seen REAL NOT NULL,
+                    symbols INTEGER NOT NULL DEFAULT 0,
+                    published INTEGER NOT NULL DEFAULT 0,
+                    latency_ms REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS config (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # --- العمال ---
+
+    def publish(self, signals, node):
+        """نشر دفعة إشارات في معاملة واحدة"""
+        if not signals:
+            return 0
+        now = time.time()
+        rows = [(node, now, json.dumps(signal, default=float)) for signal in signals]
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT INTO signals (node, created, payload) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def heartbeat(self, node, symbols=0, published=0, latency_ms=0.0):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO nodes (node, seen, symbols, published, latency_ms) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(node) DO UPDATE SET seen=excluded.seen, symbols=excluded.symbols, "
+                "published=nodes.published + excluded.published, latency_ms=excluded.latency_ms",
+                (node, time.time(), symbols, published, latency_ms)
+            )
+
+    def touch(self, node):
+        """نبض خفيف أثناء المسح أو الانتظار - يحدّث وقت الظهور فقط دون إحصاءات الدورة"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO nodes (node, seen) VALUES (?, ?) ON CONFLICT(node) DO UPDATE SET seen=excluded.seen",
+                (node, time.time())
+            )
+
+    def leave(self, node):
+        """إزالة العقدة فوراً لتنتقل عملاتها للعقد الأخرى"""
+        with self.lock:
+            self.conn.execute("DELETE FROM nodes WHERE node = ?", (node,))
+
+    def live_nodes(self):
+        cutoff = time.time() - self.node_timeout
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT node FROM nodes WHERE seen >= ?", (cutoff,))]
+
+    def symbols(self):
+        """قائمة العملات التي نشرها المنسق"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM config WHERE key = 'symbols'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    # --- المنسق ---
+
+    def set_symbols(self, symbols):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO config (key, value) VALUES ('symbols', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (json.dumps(list(symbols)),)
+            )
+
+    def consume(self, limit=500, max_age=120):
+        """سحب الإشارات وحذفها ذرياً - يعيد [(العقدة، الإشارة)] الأحدث من max_age"""
+        cutoff = time.time() - max_age
+        with self.lock:
+            with self.conn:
+                # BEGIN IMMEDIATE: منسق واحد فقط يسحب نفس الصفوف
+                self.conn.execute("BEGIN IMMEDIATE")
+                rows = self.conn.execute(
+                    "SELECT id, node, created, payload FROM signals ORDER BY id LIMIT ?", (limit,)
+                ).fetchall()
+                if rows:
+                    self.conn.execute("DELETE FROM signals WHERE id <= ?", (rows[-1][0],))
+        self.stale += sum(1 for row in rows if row[2] < cutoff)
+        return [(node, json.loads(payload)) for _, node, created, payload in rows if created >= cutoff]
+
+    def snapshot(self):
+        cutoff = time.time() - self.node_timeout
+        with self.lock:
+            backlog = self.conn.execute("SELECT COUNT(*) FROM signals").fetchone()[0]
+            nodes = [
+                {"node": node, "alive": seen >= cutoff, "age_seconds": round(time.time() - seen, 1),
+                 "symbols": symbols, "published": published, "latency_ms": latency_ms}
+                for node, seen, symbols, published, latency_ms in self.conn.execute(
+                    "SELECT node, seen, symbols, published, latency_ms FROM nodes ORDER BY node"
+                )
+            ]
+        return {"queue": self.path, "backlog": backlog, "stale": self.stale, "nodes": nodes}
+
+
+class HttpSignalQueue:
+    """واجهة العامل في SignalQueue عبر HTTP إلى المنسق - لعمال المسح على أجهزة أخرى"""
+
+    def __init__(self, url, token=None, timeout=10):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+        if token:
+            self.session.headers["X-Scan-Token"] = token
+
+    def _call(self, op, **params):
+        # الإشارات تحمل قيم NumPy - نفس تحويل SignalQueue.publish
+        response = self.session.post(f"{self.url}/cluster/{op}", data=json.dumps(params, default=float),
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def publish(self, signals, node):
+        if not signals:
+            return 0
+        return self._call("publish", signals=signals, node=node)
+
+    def heartbeat(self, node, symbols=0, published=0, latency_ms=0.0):
+        self._call("heartbeat", node=node, symbols=symbols, published=published, latency_ms=latency_ms)
+
+    def touch(self, node):
+        self._call("touch", node=node)
+
+    def leave(self, node):
+        self._call("leave", node=node)
+
+    def live_nodes(self):
+        return self._call("live_nodes")
+
+    def symbols(self):
+        return self._call("symbols")
+
+
+class ClusterFeed:
+    """جانب المنسق: يسحب إشارات العقد من الطابور ويوزعها على نواقل إشارات المحركات المشتركة"""
+
+    def __init__(self, queue, max_age=120):
+        self.queue = queue
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.stats = {"received": 0}
+
+    def subscribe(self, name, bus, symbols):
+        with self.lock:
+            self.subscribers[name] = bus
+        # العمال يقسمون قائمة العملات التي ينشرها المنسق
+        self.queue.set_symbols(symbols)
+
+    def unsubscribe(self, name):
+        with self.lock:
+            self.subscribers.pop(name, None)
+
+    def pump(self, limit=500):
+        """سحب دفعة واحدة ونشرها لكل المشتركين - آمن للاستدعاء من أكثر من محرك"""
+        with self.lock:
+            if not self.subscribers:
+                return 0
+            received = self.queue.consume(limit, self.max_age)
+            for node, signal in received:
+                for bus in self.subscribers.values():
+                    bus.publish(dict(signal), source=f"node:{node}")
+            self.stats["received"] += len(received)
+            return len(received)
+
+    def snapshot(self):
+        return {**self.stats, "subscribers": sorted(self.subscribers), **self.queue.snapshot()}
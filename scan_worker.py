@@ -0,0 +1,124 @@
+"""عامل مسح موزع - يحلل حصته (تجزئة متسقة) من عملات المنسق وينشر الإشارات في الطابور المشترك
+
+python scan_worker.py --node scan-1 --queue cluster/signals.db          (نفس جهاز المنسق)
+python scan_worker.py --node scan-2 --queue http://coordinator:5000      (جهاز آخر، SCAN_TOKEN اختياري)
+"""
+import argparse
+import concurrent.futures
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from dotenv import load_dotenv
+from binance.client import Client
+from hybrid_bot_engine import AIONHybridBot
+from market_data import MarketDataHub
+from scan_cluster import HashRing, HttpSignalQueue, SignalQueue
+from settings import SettingsStore
+from strategies import default_strategy_set
+from structured_log import setup_logging, get_logger, log_event, Timer
+
+logger = get_logger("scan_worker")
+
+
+class ScanWorker:
+    """خط المسح نفسه الخاص بالمحرك (جلب + مؤشرات + استراتيجيات) بدون تنفيذ أو حفظ"""
+
+    # نفس خط الإشارات المستخدم في المحرك
+    analyze_symbol = AIONHybridBot.analyze_symbol
+    get_advanced_signal = AIONHybridBot.get_advanced_signal
+    is_realistic_price = AIONHybridBot.is_realistic_price
+
+    # أقصى مدة بين نبضتين أثناء المسح والانتظار - أقل بكثير من node_timeout للطابور
+    BEAT_SECONDS = 10
+
+    def __init__(self, node, queue, client=None, max_workers=None, interval=None, settings=None):
+        self.name = node
+        self.queue = queue
+        # بدون قيم صريحة: scan_max_workers / scan_sleep من الإعدادات (مع إعادة التحميل)
+        self.max_workers = max_workers
+        self.interval = interval
+        self.settings_store = settings or SettingsStore()
+        self.settings = self.settings_store.current
+        # بيانات السوق العامة لا تحتاج مفاتيح - كل عقدة لها حد طلبات خاص بعنوانها
+        self.client = client or Client()
+        self.market_data = MarketDataHub(lambda: self.client)
+        self.strategies = default_strategy_set()
+        self.stop_event = threading.Event()
+
+    def partition(self):
+        """حصة هذه العقدة من العملات حسب العقد الحية حالياً"""
+        nodes = set(self.queue.live_nodes()) | {self.name}
+        return HashRing(nodes).partition(self.queue.symbols(), self.name)
+
+    def scan_once(self):
+        timer = Timer()
+        self.settings_store.maybe_reload()
+        self.settings = self.settings_store.current
+        symbols = self.partition()
+        signals = []
+        max_workers = self.max_workers or self.settings.scan_max_workers
+        beat = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.analyze_symbol, symbol) for symbol in symbols]
+            for future in concurrent.futures.as_completed(futures):
+                signal = future.result()
+                if signal:
+                    signals.append(signal)
+                # مسح طويل (عملات كثيرة/حد طلبات) لا يجعل العقدة تبدو ميتة
+                if time.time() - beat >= self.BEAT_SECONDS:
+                    self.queue.touch(self.name)
+                    beat = time.time()
+        published = self.queue.publish(signals, self.name)
+        self.queue.heartbeat(self.name, symbols=len(symbols), published=published, latency_ms=timer.ms)
+        log_event(logger, logging.INFO, "🔁 اكتملت دورة المسح", account=self.name, stage="scan",
+                  symbols=len(symbols), signals=published, latency_ms=timer.ms)
+        return published
+
+    def run(self):
+        # الإعلان عن العقدة قبل أول دورة حتى يعيد الآخرون التقسيم
+        self.queue.heartbeat(self.name)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.scan_once()
+                except Exception as e:
+                    log_event(logger, logging.ERROR, f"❌ خطأ في دورة المسح: {e}", account=self.name, stage="scan",
+                              error_class=type(e).__name__, exc_info=True)
+                # نبض أثناء الانتظار حتى لا تُعتبر العقدة ميتة
+                deadline = time.time() + (self.interval or self.settings.scan_sleep)
+                while not self.stop_event.wait(max(0, min(self.BEAT_SECONDS, deadline - time.time()))):
+                    if time.time() >= deadline:
+                        break
+                    self.queue.touch(self.name)
+        finally:
+            self.queue.leave(self.name)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Distributed scan worker")
+    parser.add_argument("--node", default=os.getenv("SCAN_NODE", f"{socket.gethostname()}-{os.getpid()}"))
+    parser.add_argument("--queue", default=os.getenv("SCAN_QUEUE", os.path.join("cluster", "signals.db")))
+    parser.add_argument("--interval", type=float, help="default: scan_sleep from settings")
+    parser.add_argument("--max-workers", type=int, help="default: scan_max_workers from settings")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.queue.startswith(("http://", "https://")):
+        queue = HttpSignalQueue(args.queue, token=os.getenv("SCAN_TOKEN"))
+    else:
+        queue = SignalQueue(args.queue)
+    worker = ScanWorker(args.node, queue, max_workers=args.max_workers, interval=args.interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, fields, asdict, replace
+from typing import Tuple
+from dotenv import dotenv_values
+from structured_log import get_logger, log_event
+
+logger = get_logger("settings")
+
+DEFAULT_SYMBOLS = (
+    "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT",
+    "SOLUSDT", "DOTUSDT", "DOGEUSDT", "AVAXUSDT", "LINKUSDT",
+    "LTCUSDT", "BCHUSDT", "XLMUSDT", "ATOMUSDT", "ETCUSDT",
+    "XMRUSDT", "EOSUSDT", "TRXUSDT", "XTZUSDT", "ALGOUSDT",
+    "BATUSDT", "COMPUSDT", "MKRUSDT", "ZECUSDT", "DASHUSDT"
+)
+
+KLINE_INTERVALS = {"1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "8h", "12h", "1d", "3d", "1w", "1M"}
+
+ENV_PREFIX = "BOT_"
+
+
+class SettingsError(ValueError):
+    """إعدادات غير صالحة - الرسالة تحتوي كل الأخطاء"""
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    """إعدادات المحرك القابلة للضبط أثناء التشغيل (الإنتاجية، الإيقاع، أحجام الذاكرة)"""
+
+    # 🌐 العملات والفترات
+    symbols: Tuple[str, ...] = DEFAULT_SYMBOLS
+    scan_intervals: Tuple[str, ...] = ("1h", "15m", "5m")
+
+    # 🔍 المراقبة المتعددة
+    scan_max_workers: int = 10
+    scan_sleep: float = 60.0
+    error_sleep: float = 30.0
+    advanced_kline_limit: int = 100
+
+    # 🎯 محلل الفرص السريع
+    quick_scan_symbols: int = 10
+    quick_scan_sleep: float = 30.0
+    quick_kline_limit: int = 50
+    quick_min_confidence: float = 0.7
+
+    # ⚙️ التنفيذ
+    symbol_cooldown_minutes: float = 10.0
+    max_open_trades: int = 5
+    paper_poll_seconds: float = 5.0
+
+    # 🧠 أحجام الذاكرة
+    memory_size: int = 200
+    balance_history_points: int = 100
+
+
+# الحدود المسموحة (أدنى، أقصى) لكل إعداد رقمي
+LIMITS = {
+    "scan_max_workers": (1, 64),
+    "scan_sleep": (1, 3600),
+    "error_sleep": (1, 3600),
+    # get_advanced_signal يحتاج 50 شمعة على الأقل
+    "advanced_kline_limit": (50, 1000),
+    "quick_scan_symbols": (0, 1000),
+    "quick_scan_sleep": (1, 3600),
+    # المؤشرات تحتاج 20 شمعة على الأقل
+    "quick_kline_limit": (20, 1000),
+    "quick_min_confidence": (0, 1),
+    "symbol_cooldown_minutes": (0, 1440),
+    "max_open_trades": (1, 10000),
+    "paper_poll_seconds": (0.5, 300),
+    "memory_size": (1, 100000),
+    "balance_history_points": (2, 100000),
+}
+
+
+def _coerce(field, value):
+    """تحويل قيمة من JSON أو نص بيئة إلى نوع الحقل"""
+    if field.type == Tuple[str, ...]:
+        if isinstance(value, str):
+            value = value.split(",")
+        return tuple(str(item).strip() for item in value if str(item).strip())
+    if field.type is int:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError("expected an integer")
+        return int(value)
+    if field.type is float:
+        return float(value)
+    return value
+
+
+def validate(settings):
+    """التحقق من القيم - يرفع SettingsError بكل الأخطاء دفعة واحدة"""
+    errors = []
+    for name, (low, high) in LIMITS.items():
+        value = getattr(settings, name)
+        if not low <= value <= high:
+            errors.append(f"{name}={value} outside [{low}, {high}]")
+    if not settings.symbols:
+        errors.append("symbols must not be empty")
+    errors += [f"invalid symbol {symbol!r}" for symbol in settings.symbols if not symbol.isalnum() or not symbol.isupper()]
+    if not settings.scan_intervals:
+        errors.append("scan_intervals must not be empty")
+    errors += [f"invalid interval {interval!r}" for interval in settings.scan_intervals if interval not in KLINE_INTERVALS]
+    if errors:
+        raise SettingsError("; ".join(errors))
+    return settings
+
+
+def load_settings(path=None, env_file=".env", environ=None):
+    """القيم الافتراضية ← ملف الإعدادات (JSON) ← البيئة (BOT_SCAN_SLEEP=45، قيم .env تُقرأ من جديد)"""
+    overrides = {}
+    errors = []
+    known = {field.name: field for field in fields(EngineSettings)}
+
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise SettingsError(f"{path}: expected a JSON object, got {type(data).__name__}")
+        unknown = sorted(set(data) - set(known))
+        if unknown:
+            errors.append(f"unknown settings: {', '.join(unknown)}")
+        overrides.update({name: value for name, value in data.items() if name in known})
+
+    env = dict(os.environ if environ is None else environ)
+    if env_file and os.path.exists(env_file):
+        env.update({k: v for k, v in dotenv_values(env_file).items() if v is not None})
+    for name in known:
+        value = env.get(ENV_PREFIX + name.upper())
+        if value is not None:
+            overrides[name] = value
+
+    values = {}
+    for name, value in overrides.items():
+        try:
+            values[name] = _coerce(known[name], value)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{name}: {e}")
+    if errors:
+        raise SettingsError("; ".join(errors))
+    return validate(replace(EngineSettings(), **values))
+
+
+class SettingsStore:
+    """الإعدادات الحالية مع إعادة تحميل عند تغير الملف أو .env - القيم غير الصالحة تُرفض وتبقى السابقة"""
+
+    def __init__(self, path=None, env_file=".env"):
+        self.path = path if path is not None else os.getenv("BOT_SETTINGS_FILE", "settings.json")
+        self.env_file = env_file
+        self.lock = threading.Lock()
+        self.version = 0
+        self.last_error = None
+        self.mtimes = self._mtimes()
+        # متغيرات .env التي نسخها load_dotenv إلى البيئة عند الإقلاع تُقرأ من الملف مباشرة
+        # حتى يؤثر حذفها أو تعديلها دون إعادة تشغيل
+        self.dotenv_keys = set(dotenv_values(env_file)) if env_file and os.path.exists(env_file) else set()
+        try:
+            self.current = self._load()
+        except (ValueError, OSError) as e:
+            # بدء التشغيل بإعدادات خاطئة لا يوقف البوت - الافتراضية مع تسجيل الخطأ
+            self.last_error = str(e)
+            self.current = EngineSettings()
+            log_event(logger, logging.ERROR, f"❌ إعدادات غير صالحة - استخدام الافتراضية: {e}", stage="settings",
+                      error_class=type(e).__name__)
+
+    def _load(self):
+        environ = {k: v for k, v in os.environ.items() if k not in self.dotenv_keys}
+        return load_settings(self.path, self.env_file, environ)
+
+    def _mtimes(self):
+        return tuple(
+            os.stat(path).st_mtime_ns if path and os.path.exists(path) else None
+            for path in (self.path, self.env_file)
+        )
+
+    def maybe_reload(self):
+        """فحص رخيص (stat) - يعيد True إذا تم تحميل إعدادات جديدة"""
+        mtimes = self._mtimes()
+        if mtimes == self.mtimes:
+            return False
+        with self.lock:
+            if mtimes == self.mtimes:
+                return False
+            self.mtimes = mtimes
+            try:
+                settings = self._load()
+            except (ValueError, OSError) as e:
+                self.last_error = str(e)
+                log_event(logger, logging.ERROR, f"❌ تم رفض الإعدادات الجديدة: {e}", stage="settings",
+                          error_class=type(e).__name__)
+                return False
+            self.last_error = None
+            if settings == self.current:
+                return False
+            changed = sorted(name for name, value in asdict(settings).items() if getattr(self.current, name) != value)
+            self.current = settings
+            self.version += 1
+            log_event(logger, logging.INFO, "🔧 تم تحميل إعدادات جديدة", stage="settings", version=self.version,
+                      changed=changed)
+            return True
+
+    def snapshot(self):
+        return {
+            "file": self.path,
+            "version": self.version,
+            "last_error": self.last_error,
+            "settings": asdict(self.current)
+        }
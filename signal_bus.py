@@ -0,0 +1,102 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class SignalBus:
+    """ناقل إشارات مركزي - دمج وإزالة تكرار لكل عملة وترتيب حسب الأولوية"""
+
+    def __init__(self, weight_provider=None, dedup_window=60, max_age=120):
+        # weight_provider: دالة تعيد وزن الاستراتيجية (0..1)
+        self.weight_provider = weight_provider or (lambda strategy: 0.0)
+        self.dedup_window = dedup_window
+        self.max_age = max_age
+
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.heap = []
+        self.pending = {}
+        self.counter = itertools.count()
+        self.last_dispatched = {}
+        self.stats = {"published": 0, "merged": 0, "dropped": 0, "dispatched": 0}
+
+    def score(self, signal):
+        """الأولوية = الثقة × (1 + وزن الاستراتيجية)"""
+        return signal["confidence"] * (1 + self.weight_provider(signal.get("strategy")))
+
+    def publish(self, signal, source=None):
+        """نشر إشارة - تُدمج مع أي إشارة معلقة لنفس العملة"""
+        now = time.time()
+        symbol = signal["symbol"]
+        score = self.score(signal)
+
+        with self.lock:
+            self.stats["published"] += 1
+
+            # تم تنفيذ إشارة لهذه العملة مؤخراً
+            if now - self.last_dispatched.get(symbol, 0) < self.dedup_window:
+                self.stats["dropped"] += 1
+                return False
+
+            current = self.pending.get(symbol)
+            if current and now - current["time"] < self.dedup_window:
+                if current["score"] >= score:
+                    self.stats["merged"] += 1
+                    current["sources"].add(source)
+                    return False
+                self.stats["merged"] += 1
+                sources = current["sources"] | {source}
+            else:
+                sources = {source}
+
+            seq = next(self.counter)
+            self.pending[symbol] = {
+                "seq": seq, "signal": signal, "score": score,
+                "time": now, "sources": sources
+            }
+            heapq.heappush(self.heap, (-score, seq, symbol))
+
+        self.event.set()
+        return True
+
+    def drain(self, limit, accept=None):
+        """سحب أفضل الإشارات بالترتيب (حتى limit إشارة مقبولة)"""
+        now = time.time()
+        selected = []
+
+        with self.lock:
+            while self.heap and len(selected) < limit:
+                _, seq, symbol = heapq.heappop(self.heap)
+                entry = self.pending.get(symbol)
+
+                # مدخل قديم تم استبداله بإشارة أفضل
+                if entry is None or entry["seq"] != seq:
+                    continue
+                del self.pending[symbol]
+
+                if now - entry["time"] > self.max_age:
+                    self.stats["dropped"] += 1
+                    continue
+                if accept and not accept(entry["signal"]):
+                    self.stats["dropped"] += 1
+                    continue
+
+                signal = dict(entry["signal"])
+                signal["priority"] = round(entry["score"], 4)
+                signal["sources"] = sorted(s for s in entry["sources"] if s)
+                selected.append(signal)
+                self.last_dispatched[symbol] = now
+                self.stats["dispatched"] += 1
+
+            if not self.pending:
+                self.event.clear()
+
+        return selected
+
+    def wait(self, timeout=None):
+        """انتظار وصول إشارات جديدة"""
+        return self.event.wait(timeout)
+
+    def size(self):
+        return len(self.pending)
@@ -0,0 +1,148 @@
+import ast
+import string
+import threading
+
+# الدوال المسموح بها داخل القواعد
+SAFE_FUNCTIONS = {"min": min, "max": max, "abs": abs, "round": round}
+
+
+def _names(expression):
+    """أسماء الميزات المستخدمة في تعبير"""
+    tree = ast.parse(expression, mode="eval")
+    return {node.id for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and node.id not in SAFE_FUNCTIONS}
+
+
+class Strategy:
+    """استراتيجية مُعرّفة بقاعدة - تُترجم مرة واحدة وتُقيَّم على متجه الميزات"""
+
+    def __init__(self, name, group, action, when, confidence, reason, weight=None):
+        self.name = name
+        self.group = group
+        self.action = action
+        self.reason = reason
+        self.weight = weight
+
+        # ترجمة القواعد مرة واحدة عند التسجيل
+        self.when = compile(when, f"<{name}:when>", "eval")
+        self.confidence = compile(str(confidence), f"<{name}:confidence>", "eval")
+
+        reason_fields = {field for _, field, _, _ in string.Formatter().parse(reason) if field}
+        self.features = _names(when) | _names(str(confidence)) | reason_fields
+
+    def evaluate(self, features):
+        """تقييم القاعدة - تعيد (الثقة، السبب) أو None"""
+        scope = {"__builtins__": {}, **SAFE_FUNCTIONS}
+        if not eval(self.when, scope, features):
+            return None
+        return eval(self.confidence, scope, features), self.reason.format(**features)
+
+
+class StrategySet:
+    """مجموعة استراتيجيات قابلة للتوسعة - تقييم الكل في مرور واحد"""
+
+    def __init__(self, strategies=None):
+        self.lock = threading.Lock()
+        self.strategies = {}
+        self._required = {}
+        for strategy in strategies or []:
+            self.register(strategy)
+
+    def register(self, strategy):
+        with self.lock:
+            self.strategies[strategy.name] = strategy
+            self._required = {}
+
+    def unregister(self, name):
+        with self.lock:
+            self.strategies.pop(name, None)
+            self._required = {}
+
+    def group(self, group):
+        return [s for s in list(self.strategies.values()) if s.group == group]
+
+    def required(self, group):
+        """اتحاد الميزات المطلوبة لكل استراتيجيات المجموعة"""
+        required = self._required.get(group)
+        if required is None:
+            required = set()
+            for strategy in self.group(group):
+                required |= strategy.features
+            required = frozenset(required)
+            self._required[group] = required
+        return required
+
+    def evaluate(self, group, features, symbol):
+        """تقييم كل استراتيجيات المجموعة على نفس المتجه"""
+        signals = []
+        for strategy in self.group(group):
+            result = strategy.evaluate(features)
+            if result is None:
+                continue
+            confidence, reason = result
+            signals.append({
+                "action": strategy.action,
+                "symbol": symbol,
+                "strategy": strategy.name,
+                "confidence": confidence,
+                "price": features["price"],
+                "reason": reason
+            })
+        return signals
+
+    def initial_weights(self):
+        return {s.name: s.weight for s in self.strategies.values() if s.weight is not None}
+
+
+# 📚 الاستراتيجيات الافتراضية
+DEFAULT_STRATEGIES = [
+    # 1. إشارة انعكاس متوسط
+    Strategy(
+        "mean_reversion", "advanced", "BUY",
+        when="rsi < 30 and macd_diff > 0",
+        confidence="min(0.75 + (35 - rsi) / 35 * 0.2, 0.95)",
+        reason="انعكاس محتمل - RSI منخفض ({rsi:.1f})",
+        weight=0.4
+    ),
+    # 2. إشارة زخم
+    Strategy(
+        "momentum", "advanced", "SELL",
+        when="rsi > 65 and macd_diff < 0",
+        confidence="min(0.70 + (rsi - 65) / 35 * 0.2, 0.90)",
+        reason="زخم هبوطي - RSI مرتفع ({rsi:.1f})",
+        weight=0.3
+    ),
+    # 3. إشارة متابعة الاتجاه
+    Strategy(
+        "trend_following", "advanced", "BUY",
+        when="macd_diff > 0.002 and rsi < 60",
+        confidence=0.68,
+        reason="اتجاه صاعد قوي - MACD إيجابي",
+        weight=0.2
+    ),
+    # 4. إشارة كسر
+    Strategy(
+        "breakout", "advanced", "BUY",
+        when="high > prev_high and volume > prev_volume * 1.2",
+        confidence=0.72,
+        reason="كسر مقاومة مع حجم مرتفع",
+        weight=0.1
+    ),
+    # إشارات سريعة
+    Strategy(
+        "quick_reversal", "quick", "BUY",
+        when="price_change < -2",
+        confidence=0.75,
+        reason="هبوط سريع ({price_change:.2f}%) - فرصة شراء"
+    ),
+    Strategy(
+        "quick_momentum", "quick", "SELL",
+        when="price_change > 2",
+        confidence=0.70,
+        reason="صعود سريع ({price_change:.2f}%) - فرصة بيع"
+    ),
+]
+
+
+def default_strategy_set():
+    return StrategySet(DEFAULT_STRATEGIES)
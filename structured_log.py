@@ -0,0 +1,147 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+
+ROOT_LOGGER = "trendjmal"
+
+_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """سطر JSON لكل حدث مع الحقول المهيكلة"""
+
+    def format(self, record):
+        event = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        # التتبع (traceback) وصل كحقل من StructuredQueueHandler
+        event.update(getattr(record, "fields", {}))
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """سطر مقروء للطرفية مع الحقول في النهاية"""
+
+    def format(self, record):
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname[0]} {record.name}: {record.getMessage()}"
+        fields = dict(getattr(record, "fields", None) or {})
+        trace = fields.pop("traceback", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if trace:
+            line += "\n" + trace
+        return line
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler يحافظ على الحقول المهيكلة
+
+    prepare الافتراضي يدمج التتبع في نص الرسالة ويحذف exc_info قبل الطابور، فينقل هنا
+    إلى الحقلين error_class و traceback"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        fields = dict(getattr(record, "fields", {}))
+        if record.exc_info and record.exc_info[0] is not None:
+            fields["error_class"] = fields.get("error_class") or record.exc_info[0].__name__
+            fields["traceback"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        record.fields = fields
+        record.msg = record.getMessage()
+        record.message = record.msg
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+
+def setup_logging(level=None, module_levels=None, log_file=None, max_bytes=10 * 1024 * 1024, backups=5):
+    """تهيئة خط السجلات: طابور غير حاجب -> مستمع واحد -> ملف دوّار (JSON) + الطرفية
+
+    يمكن التحكم عبر البيئة:
+    LOG_LEVEL=INFO, LOG_LEVELS="engine=DEBUG,market_data=WARNING", LOG_FILE=logs/trendjmal.log
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        level = level or os.getenv("LOG_LEVEL", "INFO")
+        module_levels = module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+        log_file = log_file if log_file is not None else os.getenv("LOG_FILE", os.path.join("logs", "trendjmal.log"))
+
+        handlers = []
+        console = logging.StreamHandler()
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        # العمال يضعون السجل في الطابور فقط - الكتابة تتم في خيط المستمع
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level.upper())
+        root.handlers[:] = [StructuredQueueHandler(log_queue)]
+        root.propagate = False
+
+        for item in filter(None, module_levels.split(",")):
+            name, _, module_level = item.partition("=")
+            logging.getLogger(f"{ROOT_LOGGER}.{name.strip()}").setLevel(module_level.strip().upper())
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """تفريغ الطابور وإيقاف المستمع"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def log_event(logger, level, message, sample=None, exc_info=None, **fields):
+    """تسجيل حدث مهيكل. sample: نسبة العينة للأحداث عالية التكرار (0..1)"""
+    if not logger.isEnabledFor(level):
+        return
+    if sample is not None and random.random() >= sample:
+        return
+    if sample is not None:
+        fields["sample_rate"] = sample
+    logger.log(level, message, exc_info=exc_info, extra={"fields": fields})
+
+
+class Timer:
+    """قياس زمن مرحلة بالميلي ثانية"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    @property
+    def ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 1)
@@ -0,0 +1,195 @@
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from trade_ledger import to_epoch, to_iso
+
+
+class RollupSeries:
+    """سلسلة زمنية بدقة ثابتة في حلقة دائرية محدودة الحجم"""
+
+    FIELDS = ("time", "balance", "equity", "low", "high")
+
+    def __init__(self, bucket_seconds, retention):
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.columns = {name: np.zeros(retention, dtype=np.float64) for name in self.FIELDS}
+        self.start = 0
+        self.size = 0
+
+    def _index(self, logical):
+        return (self.start + logical) % self.retention
+
+    def add(self, timestamp, balance, equity):
+        """إضافة نقطة - تُدمج في آخر حاوية إن كانت في نفس الفترة"""
+        bucket = timestamp
+        if self.bucket_seconds:
+            bucket = timestamp - timestamp % self.bucket_seconds
+
+        if self.size and self.bucket_seconds:
+            last = self._index(self.size - 1)
+            if self.columns["time"][last] == bucket:
+                # آخر قيمة في الفترة + أدنى/أعلى قيمة للرصيد
+                self.columns["balance"][last] = balance
+                self.columns["equity"][last] = equity
+                self.columns["low"][last] = min(self.columns["low"][last], balance)
+                self.columns["high"][last] = max(self.columns["high"][last], balance)
+                return
+
+        index = self._index(self.size)
+        if self.size == self.retention:
+            self.start = (self.start + 1) % self.retention
+        else:
+            self.size += 1
+        for name, value in zip(self.FIELDS, (bucket, balance, equity, balance, balance)):
+            self.columns[name][index] = value
+
+    def first_time(self):
+        return self.columns["time"][self._index(0)] if self.size else None
+
+    def _bisect(self, timestamp):
+        """بحث ثنائي على الترتيب المنطقي للحلقة"""
+        times = self.columns["time"]
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if times[self._index(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def count_range(self, start, end):
+        return max(0, self._bisect(end + 1e-9) - self._bisect(start))
+
+    def query(self, start, end, max_points):
+        """النقاط داخل المدى، مع تخفيف منتظم إلى max_points كحد أقصى"""
+        lo = self._bisect(start)
+        hi = self._bisect(end + 1e-9)
+        if hi <= lo:
+            return []
+        step = max(1, -(-(hi - lo) // max_points))
+        indices = self._index(np.arange(lo, hi, step))
+        return [
+            {
+                "timestamp": to_iso(self.columns["time"][i]),
+                "balance": round(float(self.columns["balance"][i]), 2),
+                "equity": round(float(self.columns["equity"][i]), 2),
+                "low": round(float(self.columns["low"][i]), 2),
+                "high": round(float(self.columns["high"][i]), 2)
+            }
+            for i in indices
+        ]
+
+    def export(self, prefix):
+        order = self._index(np.arange(self.size))
+        return {f"{prefix}_{name}": column[order] for name, column in self.columns.items()}
+
+    def restore(self, archive, prefix):
+        times = archive[f"{prefix}_time"][-self.retention:]
+        self.start = 0
+        self.size = len(times)
+        for name in self.FIELDS:
+            self.columns[name][:self.size] = archive[f"{prefix}_{name}"][-self.retention:]
+
+
+class BalanceTimeseriesStore:
+    """مخزن رصيد/حقوق متعدد الدقة (خام، دقيقة، ساعة، يوم) مع حفظ دائم"""
+
+    # الدقة: (طول الحاوية بالثواني، عدد النقاط المحفوظة)
+    RESOLUTIONS = {
+        "raw": (0, 2000),
+        "minute": (60, 7 * 1440),
+        "hour": (3600, 365 * 24),
+        "day": (86400, 10 * 365)
+    }
+
+    def __init__(self, path="hybrid_balance_ts.npz", max_points=500, save_interval=30):
+        self.path = path
+        self.max_points = max_points
+        self.save_interval = save_interval
+        self.last_saved = 0.0
+        self.lock = threading.Lock()
+        self.series = {
+            name: RollupSeries(bucket, retention)
+            for name, (bucket, retention) in self.RESOLUTIONS.items()
+        }
+
+    def add(self, balance, equity=None, timestamp=None):
+        """تسجيل نقطة رصيد في جميع الدقات"""
+        timestamp = to_epoch(timestamp) if timestamp is not None else datetime.now().timestamp()
+        equity = balance if equity is None else equity
+        with self.lock:
+            for series in self.series.values():
+                series.add(timestamp, balance, equity)
+
+    def first_time(self):
+        """أقدم نقطة مسجلة - من أدق دقة ما زالت تحتفظ باليوم الأول (الحاويات الأخشن مقربة للأسفل)"""
+        day_start = self.series["day"].first_time()
+        if day_start is None:
+            return None
+        for series in self.series.values():
+            first = series.first_time()
+            if first is not None and first < day_start + self.series["day"].bucket_seconds:
+                return first
+        return day_start
+
+    def pick_resolution(self, start, end, max_points):
+        """أدق دقة تغطي المدى بعدد نقاط لا يتجاوز الحد"""
+        for name, series in self.series.items():
+            first = series.first_time()
+            # التغطية تُقارن ببداية الحاوية التي تقع فيها start في هذه الدقة
+            bucket = series.bucket_seconds
+            floored = start - start % bucket if bucket else start
+            if first is None or (first > floored and name != "day"):
+                continue
+            if series.count_range(start, end) <= max_points:
+                return name
+        return "day"
+
+    def query(self, start=None, end=None, resolution=None, max_points=None):
+        """نقاط الرصيد لمدى ودقة معينين - حجم الرد محدود دائماً"""
+        if max_points is not None and max_points <= 0:
+            raise ValueError("max_points must be positive")
+        max_points = min(max_points or self.max_points, self.max_points)
+        end = to_epoch(end) if end is not None else datetime.now().timestamp()
+
+        with self.lock:
+            if start is None:
+                start = self.first_time() or end
+            start = to_epoch(start)
+            if resolution not in self.series:
+                resolution = self.pick_resolution(start, end, max_points)
+            points = self.series[resolution].query(start, end, max_points)
+
+        return {
+            "resolution": resolution,
+            "start": to_iso(start),
+            "end": to_iso(end),
+            "points": points
+        }
+
+    def save(self, force=False):
+        """حفظ ذري للمخزن (بحد أقصى مرة كل save_interval ثانية)"""
+        now = datetime.now().timestamp()
+        if not force and now - self.last_saved < self.save_interval:
+            return False
+        self.last_saved = now
+        with self.lock:
+            arrays = {}
+            for name, series in self.series.items():
+                arrays.update(series.export(name))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, self.path)
+        return True
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as archive, self.lock:
+            for name, series in self.series.items():
+                if f"{name}_time" in archive:
+                    series.restore(archive, name)
+        return True
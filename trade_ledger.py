@@ -0,0 +1,372 @@
+import glob
+import os
+import threading
+from datetime import datetime
+import numpy as np
+
+
+class StringTable:
+    """جدول نصوص مُوحّد - كل نص مكرر يُخزن مرة واحدة ويُشار إليه برقم"""
+
+    def __init__(self, values=None):
+        self.values = []
+        self.codes = {}
+        for value in values or []:
+            self.intern(value)
+
+    def intern(self, value):
+        value = "" if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+def to_epoch(value):
+    """تحويل وقت ISO أو datetime إلى ثوانٍ منذ 1970"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '')).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def to_iso(epoch):
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+class TradeLedger:
+    """سجل صفقات عمودي مضغوط (NumPy) - القواميس تُنشأ فقط عند حدود JSON"""
+
+    # الحقول النصية المكررة تُخزن كرموز في جداول نصوص
+    STRING_FIELDS = ("symbol", "action", "strategy", "reason", "interval", "status", "exit_reason")
+    FLOAT_FIELDS = (
+        "entry_price", "quantity", "amount", "profit", "profit_percentage",
+        "confidence", "balance_before", "balance_after", "exit_price", "slippage_bps"
+    )
+    # ترتيب الحقول كما في قاموس الصفقة الأصلي (حقول الخروج من محاكي الوضع التجريبي)
+    FIELD_ORDER = (
+        "id", "symbol", "action", "strategy", "entry_price", "quantity", "amount",
+        "profit", "profit_percentage", "confidence", "reason", "interval", "status",
+        "entry_time", "balance_before", "balance_after",
+        "exit_price", "exit_reason", "exit_time", "slippage_bps"
+    )
+
+    # عدد المقاطع الإلحاقية قبل الدمج في الملف المضغوط
+    MAX_SEGMENTS = 256
+
+    DTYPE = np.dtype(
+        [("id_prefix", np.int32), ("id_num", np.int64), ("entry_time", np.float64),
+         ("exit_time", np.float64), ("record_time", np.float64)]
+        + [(name, np.int32) for name in STRING_FIELDS]
+        + [(name, np.float64) for name in FLOAT_FIELDS]
+    )
+
+    def __init__(self, capacity=1024):
+        self.lock = threading.RLock()
+        self.data = np.zeros(capacity, dtype=self.DTYPE)
+        self.size = 0
+        self.strings = {name: StringTable() for name in self.STRING_FIELDS + ("id_prefix",)}
+        # حقول إضافية نادرة خارج المخطط: {رقم الصف: {الحقل: القيمة}}
+        self.extras = {}
+        # حالة الحفظ الإلحاقي: ما كُتب على القرص من صفوف ونصوص، والمقاطع المدمجة في هذا السجل منذ آخر دمج
+        self.saved_rows = 0
+        self.saved_strings = {}
+        self.segment_files = set()
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def _grow(self):
+        new_data = np.zeros(len(self.data) * 2, dtype=self.DTYPE)
+        new_data[:self.size] = self.data[:self.size]
+        self.data = new_data
+
+    def append(self, trade):
+        """إضافة صفقة (قاموس) إلى السجل"""
+        with self.lock:
+            if self.size >= len(self.data):
+                self._grow()
+            row = self.data[self.size]
+
+            # المعرّف "OPP-1700000000000" يُقسم إلى بادئة ورقم
+            trade_id = str(trade.get("id", ""))
+            prefix, _, number = trade_id.rpartition("-")
+            if prefix and number.isdigit():
+                row["id_prefix"] = self.strings["id_prefix"].intern(prefix)
+                row["id_num"] = int(number)
+            else:
+                row["id_prefix"] = self.strings["id_prefix"].intern(trade_id)
+                row["id_num"] = -1
+
+            row["entry_time"] = to_epoch(trade.get("entry_time", trade.get("timestamp", 0)))
+            row["exit_time"] = to_epoch(trade["exit_time"]) if trade.get("exit_time") else 0.0
+            # وقت التسجيل (الخروج أو الدخول) عمود مرتب دائماً: صفقات المحاكي تُسجل عند الإغلاق
+            # بوقت دخول أقدم، فلا يصلح entry_time للبحث الثنائي
+            recorded = row["exit_time"] or row["entry_time"]
+            row["record_time"] = max(recorded, self.data["record_time"][self.size - 1]) if self.size else recorded
+            for name in self.STRING_FIELDS:
+                row[name] = self.strings[name].intern(trade.get(name))
+            for name in self.FLOAT_FIELDS:
+                row[name] = float(trade.get(name) or 0.0)
+
+            extra = {k: v for k, v in trade.items()
+                     if k not in self.FIELD_ORDER and k != "timestamp"}
+            if extra:
+                self.extras[self.size] = extra
+
+            self.size += 1
+
+    def extend(self, trades):
+        for trade in trades:
+            self.append(trade)
+
+    def record(self, index):
+        """تحويل صف واحد إلى قاموس"""
+        row = self.data[index]
+        prefix = self.strings["id_prefix"][row["id_prefix"]]
+        trade = {
+            "id": f"{prefix}-{row['id_num']}" if row["id_num"] >= 0 else prefix,
+            "entry_time": to_iso(row["entry_time"]),
+            "exit_time": to_iso(row["exit_time"]) if row["exit_time"] else None
+        }
+        for name in self.STRING_FIELDS:
+            trade[name] = self.strings[name][row[name]]
+        for name in self.FLOAT_FIELDS:
+            trade[name] = float(row[name])
+        ordered = {name: trade[name] for name in self.FIELD_ORDER}
+        ordered.update(self.extras.get(index, {}))
+        return ordered
+
+    def __getitem__(self, key):
+        with self.lock:
+            if isinstance(key, slice):
+                return [self.record(i) for i in range(*key.indices(self.size))]
+            if key < 0:
+                key += self.size
+            if not 0 <= key < self.size:
+                raise IndexError("trade index out of range")
+            return self.record(key)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.record(i)
+
+    def tail(self, limit):
+        """آخر الصفقات كقواميس"""
+        return self[-limit:] if limit > 0 else []
+
+    def to_list(self):
+        return self[:]
+
+    def column(self, name):
+        """عرض عمودي (بدون نسخ) لحقل رقمي"""
+        return self.data[name][:self.size]
+
+    def count_since(self, epoch):
+        """عدد الصفقات المسجلة بعد وقت معين - بحث ثنائي على record_time المرتب"""
+        with self.lock:
+            times = self.data["record_time"][:self.size]
+            return int(self.size - np.searchsorted(times, epoch, side="left"))
+
+    def count_entered_since(self, epoch):
+        """عدد الصفقات التي دخلت بعد وقت معين - record_time >= entry_time فالفحص يقتصر على ذيل السجل"""
+        with self.lock:
+            start = int(np.searchsorted(self.data["record_time"][:self.size], epoch, side="left"))
+            return int(np.count_nonzero(self.data["entry_time"][start:self.size] >= epoch))
+
+    def nbytes(self):
+        return self.data[:self.size].nbytes
+
+    def save(self, path, compact=False):
+        """حفظ إلحاقي: الصفوف الجديدة فقط في مقطع صغير بجانب الملف، والدمج في npz مضغوط واحد
+        عند compact أو بعد MAX_SEGMENTS مقطعاً - كلفة الحفظ لكل صفقة لا تكبر مع حجم السجل"""
+        with self.lock:
+            # مقطع لم يُحمّل في هذا السجل كتبته عملية أخرى - الكتابة فوقه أو حذفه يضيع صفقاتها
+            foreign = set(self._segment_paths(path)) - self.segment_files
+            if foreign:
+                raise RuntimeError(f"trade ledger changed on disk by another process ({len(foreign)} new segments) - not saving")
+            if compact or len(self.segment_files) >= self.MAX_SEGMENTS or not os.path.exists(path):
+                self._save_full(path)
+            elif self.size > self.saved_rows:
+                self._save_segment(path)
+
+    @staticmethod
+    def _segment_paths(path):
+        # اسم المقطع يحمل رقم أول صف فيه - الترتيب الأبجدي هو ترتيب الإلحاق
+        return sorted(glob.glob(glob.escape(path) + ".*.seg"))
+
+    @staticmethod
+    def _write(path, compressed=False, **arrays):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            (np.savez_compressed if compressed else np.savez)(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def _mark_saved(self):
+        self.saved_rows = self.size
+        self.saved_strings = {name: len(table.values) for name, table in self.strings.items()}
+
+    def _save_full(self, path):
+        tables = {f"strings_{name}": np.array(table.values, dtype=object)
+                  for name, table in self.strings.items()}
+        extras = np.array([self.extras], dtype=object)
+        self._write(path, compressed=True, data=self.data[:self.size], extras=extras, **tables)
+        # المقاطع أصبحت داخل الملف الكامل - حذفها بعد الاستبدال الذري فقط (مقاطع هذا السجل وحدها)
+        for segment in self.segment_files:
+            os.remove(segment)
+        self.segment_files = set()
+        self._mark_saved()
+
+    def _save_segment(self, path):
+        start = self.saved_rows
+        arrays = {"start": np.array(start), "data": self.data[start:self.size],
+                  "extras": np.array([{i: v for i, v in self.extras.items() if i >= start}], dtype=object)}
+        # جداول النصوص: القيم الجديدة فقط مع موضع بدايتها
+        for name, table in self.strings.items():
+            offset = self.saved_strings.get(name, 0)
+            arrays[f"strings_{name}"] = np.array(table.values[offset:], dtype=object)
+            arrays[f"offset_{name}"] = np.array(offset)
+        segment = f"{path}.{start:012d}.seg"
+        self._write(segment, **arrays)
+        self.segment_files.add(segment)
+        self._mark_saved()
+
+    def _load_segment(self, archive):
+        """دمج مقطع محفوظ - يعيد False عند وجود فجوة (يتوقف التحميل عند آخر صف متصل)"""
+        start = int(archive["start"])
+        data = archive["data"]
+        if start > self.size:
+            return False
+        for name, table in self.strings.items():
+            if f"offset_{name}" not in archive:
+                continue
+            offset = int(archive[f"offset_{name}"])
+            if offset > len(table.values):
+                return False
+            for value in archive[f"strings_{name}"].tolist()[len(table.values) - offset:]:
+                table.intern(value)
+        # مقطع سبق دمجه جزئياً (انقطاع أثناء الدمج الكامل) - تخطي الصفوف الموجودة
+        rows = data[self.size - start:]
+        while self.size + len(rows) > len(self.data):
+            self._grow()
+        self._put_rows(rows)
+        self.extras.update({i: v for i, v in archive["extras"][0].items() if i >= self.size})
+        self.size += len(rows)
+        return True
+
+    def _put_rows(self, rows):
+        """نسخ صفوف محفوظة بعد آخر صف - الملفات الأقدم بمخطط أصغر تُنسخ حسب أسماء الحقول"""
+        target = self.data[self.size:self.size + len(rows)]
+        if rows.dtype == self.DTYPE:
+            target[:] = rows
+            return
+        for name in rows.dtype.names:
+            if name in self.DTYPE.names:
+                target[name] = rows[name]
+        if "record_time" not in rows.dtype.names:
+            self._fill_record_time(target, self.data["record_time"][self.size - 1] if self.size else -np.inf)
+
+    @staticmethod
+    def _fill_record_time(target, previous=-np.inf):
+        """record_time لصفوف قديمة: وقت الخروج إن وجد وإلا الدخول، مع الحفاظ على الترتيب"""
+        recorded = np.where(target["exit_time"] > 0, target["exit_time"], target["entry_time"])
+        target["record_time"] = np.maximum.accumulate(np.maximum(recorded, previous))
+
+    def _migrate_extras(self):
+        """نقل حقول المخطط المحفوظة سابقاً في extras (ملفات قديمة) إلى أعمدتها"""
+        for index, extra in list(self.extras.items()):
+            row = self.data[index]
+            for name in self.STRING_FIELDS + self.FLOAT_FIELDS + ("exit_time",):
+                if name not in extra:
+                    continue
+                value = extra.pop(name)
+                if name in self.STRING_FIELDS:
+                    row[name] = self.strings[name].intern(value)
+                elif name == "exit_time":
+                    row[name] = to_epoch(value) if value else 0.0
+                else:
+                    row[name] = float(value or 0.0)
+            if not extra:
+                del self.extras[index]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=True) as archive:
+            data = archive["data"]
+            ledger = cls(capacity=max(1024, len(data) * 2))
+            ledger._put_rows(data)
+            ledger.size = len(data)
+            for name in ledger.strings:
+                key = f"strings_{name}"
+                # حقل نصي جديد في المخطط: الرمز 0 في الصفوف القديمة يعني نصاً فارغاً
+                ledger.strings[name] = StringTable(archive[key].tolist() if key in archive else [""])
+            ledger.extras = archive["extras"][0]
+            if "record_time" not in data.dtype.names:
+                ledger._migrate_extras()
+                ledger._fill_record_time(ledger.data[:ledger.size])
+        segments = cls._segment_paths(path)
+        for position, segment in enumerate(segments):
+            with np.load(segment, allow_pickle=True) as archive:
+                loaded = ledger._load_segment(archive)
+            if not loaded:
+                # فجوة: المقاطع بعدها لا تتصل بالسجل - تُنقل جانباً (لا تُحذف) حتى لا تمنع الحفظ
+                for orphan in segments[position:]:
+                    os.replace(orphan, orphan + ".orphan")
+                break
+            ledger.segment_files.add(segment)
+        ledger._migrate_extras()
+        ledger._mark_saved()
+        return ledger
+
+
+class BalanceSeries:
+    """تاريخ رصيد عمودي بحلقة دائرية - إضافة O(1) بدلاً من pop(0)"""
+
+    def __init__(self, max_points=100):
+        self.max_points = max_points
+        self.timestamps = np.zeros(max_points, dtype=np.float64)
+        self.balances = np.zeros(max_points, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, balance, timestamp=None):
+        timestamp = to_epoch(timestamp) if timestamp is not None else datetime.now().timestamp()
+        index = (self.start + self.size) % self.max_points
+        if self.size == self.max_points:
+            self.start = (self.start + 1) % self.max_points
+        else:
+            self.size += 1
+        self.timestamps[index] = timestamp
+        self.balances[index] = balance
+
+    def arrays(self):
+        """الأعمدة بالترتيب الزمني"""
+        order = (self.start + np.arange(self.size)) % self.max_points
+        return self.timestamps[order], self.balances[order]
+
+    def to_list(self):
+        timestamps, balances = self.arrays()
+        return [{"timestamp": to_iso(ts), "balance": round(float(b), 2)}
+                for ts, b in zip(timestamps, balances)]
+
+    @classmethod
+    def from_list(cls, points, max_points=100):
+        series = cls(max_points)
+        for point in points:
+            series.append(point.get("balance", 0.0), point.get("timestamp"))
+        return series